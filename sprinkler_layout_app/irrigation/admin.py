@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, Yard, SprinklerHead, Zone, BillOfMaterials, SketchElement
+from .models import Project, Yard, SprinklerHead, Zone, BillOfMaterials, SketchElement, ZoneSchedule, OutboundEmail
 
 # Register your models here.
 admin.site.register(Project)
@@ -8,3 +8,5 @@ admin.site.register(SprinklerHead)
 admin.site.register(Zone)
 admin.site.register(BillOfMaterials)
 admin.site.register(SketchElement)
+admin.site.register(ZoneSchedule)
+admin.site.register(OutboundEmail)
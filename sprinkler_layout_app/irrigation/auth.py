@@ -0,0 +1,191 @@
+"""
+Cheaper JWT authentication.
+
+CachedJWTAuthentication keeps resolved users in a short-TTL, per-process
+cache, so most requests authenticate without touching the database. Saving
+or deleting a user drops it from this process's cache; other processes see
+the change within USER_CACHE_TTL seconds.
+
+BlacklistFilteredRefreshToken checks a process-local Bloom filter of
+blacklisted token ids before the blacklist table. A miss is definitive, so
+tokens that were never blacklisted (nearly all of them) skip the query. The
+filter pulls new blacklist rows at most every BLACKLIST_SYNC_SECONDS, which
+bounds how long a token blacklisted by another process can go unnoticed.
+
+New rows are found by id, but concurrent transactions can commit out of id
+order: a row can appear below ids the filter has already moved past. Each
+gap in the ids seen is rechecked on every sync for BLACKLIST_GAP_SECONDS,
+which must outlast the longest transaction that blacklists a token.
+"""
+import copy
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def auth_settings():
+    return {
+        'USER_CACHE_TTL': 30.0,
+        'USER_CACHE_SIZE': 10000,
+        'BLACKLIST_SYNC_SECONDS': 5.0,
+        'BLACKLIST_CAPACITY': 100000,
+        'BLACKLIST_GAP_SECONDS': 60.0,
+        **getattr(settings, 'IRRIGATION_AUTH', {}),
+    }
+
+
+class UserCache:
+    """
+    Thread-safe {user id: user} map whose entries expire after USER_CACHE_TTL
+    seconds. Ids are compared as strings, the form tokens carry them in.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._entries.get(str(user_id))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, user):
+        config = auth_settings()
+        with self._lock:
+            if len(self._entries) >= config['USER_CACHE_SIZE']:
+                self._entries.clear()
+            self._entries[str(user_id)] = (time.monotonic() + config['USER_CACHE_TTL'], user)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        else:
+            self.check_user(user, validated_token)
+        # Each request gets its own instance so views can't leak changes into the cache
+        return copy.copy(user)
+
+    def check_user(self, user, validated_token):
+        """The checks JWTAuthentication.get_user makes after loading the user."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        a, b = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return ((a + i * b) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class BlacklistFilter:
+    """Bloom filter of blacklisted jtis, kept in step with the BlacklistedToken table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._capacity = 0
+            self._count = 0
+            self._last_id = 0
+            self._gaps = []  # [(first missing id, last missing id, noticed at)]
+            self._synced_at = -math.inf
+
+    def _sync(self):
+        config = auth_settings()
+        now = time.monotonic()
+        if now - self._synced_at < config['BLACKLIST_SYNC_SECONDS']:
+            return
+        with self._lock:
+            if self._bloom is None or self._count > self._capacity:
+                # (Re)build with room to grow once full, which also drops purged tokens
+                self._capacity = max(config['BLACKLIST_CAPACITY'], 2 * BlacklistedToken.objects.count())
+                self._bloom = BloomFilter(self._capacity)
+                self._count = 0
+                self._last_id = 0
+                self._gaps = []
+            self._gaps = [gap for gap in self._gaps if now - gap[2] < config['BLACKLIST_GAP_SECONDS']]
+            new = Q(id__gt=self._last_id)
+            for first, last, _ in self._gaps:
+                new |= Q(id__range=(first, last))
+            rows = BlacklistedToken.objects.filter(new).order_by('id').values_list('id', 'token__jti')
+            for row_id, jti in rows.iterator():
+                if jti not in self._bloom:
+                    self._bloom.add(jti)
+                    self._count += 1
+                if row_id > self._last_id:
+                    if row_id > self._last_id + 1:
+                        self._gaps.append((self._last_id + 1, row_id - 1, now))
+                    self._last_id = row_id
+            self._synced_at = now
+
+    def might_contain(self, jti):
+        self._sync()
+        return jti in self._bloom
+
+    def add(self, jti):
+        self._sync()
+        with self._lock:
+            self._bloom.add(jti)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class BlacklistFilteredRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if not blacklist_filter.might_contain(jti):
+            return
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
@@ -0,0 +1,128 @@
+"""
+Bill of materials generated from a yard's zones and heads.
+
+Head and nozzle counts come from one grouped COUNT query. Pipe lengths and
+fittings come from each zone's lateral network (see hydraulics.py). Costs
+use the price table in IRRIGATION_BOM_PRICES, read once per process; without
+a table the items are listed unpriced.
+"""
+import csv
+import math
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .hydraulics import PIPE_SIZES, yard_hydraulics
+from .models import BillOfMaterials, SprinklerHead, Yard
+
+PIPE_WASTE = 1.1  # cut-offs and routing around obstacles
+NOZZLE_PATTERNS = {360: 'full', 270: 'three_quarter', 180: 'half', 120: 'third', 90: 'quarter'}
+
+
+@lru_cache(maxsize=None)
+def price_table():
+    """{(category, item): (unit, unit price)} from the configured CSV, or {} without one."""
+    path = Path(settings.IRRIGATION_BOM_PRICES)
+    if not path.exists():
+        return {}
+    with open(path, newline='') as f:
+        return {(row['category'], row['item']): (row['unit'], float(row['unit_price'])) for row in csv.DictReader(f)}
+
+
+def nozzle_pattern(angle):
+    return NOZZLE_PATTERNS.get(round(angle or 0), 'adjustable')
+
+
+def head_counts(yard):
+    """(type, angle, quantity) rows for the yard's heads from a single grouped query."""
+    return (
+        SprinklerHead.objects.filter(zone__yard=yard)
+        .values_list('type', 'angle')
+        .annotate(quantity=Count('id'))
+        .order_by()
+    )
+
+
+def network_materials(networks):
+    """
+    Pipe feet per size plus fittings from solved zone networks. Each head sits
+    on a swing joint; a lateral branching off at a head needs a tee there, the
+    last head on a run an elbow, and a change of pipe size a reducer.
+    """
+    pipe = defaultdict(float)
+    fittings = Counter()
+    valves = 0
+    for network in networks:
+        segments = network['segments']
+        if not segments:
+            continue
+        valves += 1
+        size_into = {s['to']: s['size'] for s in segments}
+        children = Counter(s['from'] for s in segments)
+        for segment in segments:
+            pipe[segment['size']] += segment['length']
+            fittings['swing_joint'] += 1
+            if segment['from'] != 'valve':
+                fittings['tee'] += 1
+                if size_into[segment['from']] != segment['size']:
+                    fittings['reducer'] += 1
+            if not children[segment['to']]:
+                fittings['elbow'] += 1
+    return pipe, fittings, valves
+
+
+def build_bom(yard):
+    """Returns (items, estimated cost) for a yard; the cost is None when nothing is priced."""
+    heads, nozzles = Counter(), Counter()
+    for head_type, angle, quantity in head_counts(yard):
+        head_type = str(head_type).strip().lower()
+        heads[head_type] += quantity
+        nozzles[nozzle_pattern(angle)] += quantity
+
+    pipe, fittings, valves = network_materials(yard_hydraulics(yard).values())
+
+    lines = [('head', name, quantity) for name, quantity in sorted(heads.items())]
+    lines += [('nozzle', name, quantity) for name, quantity in sorted(nozzles.items())]
+    lines += [('pipe', name, math.ceil(pipe[name] * PIPE_WASTE)) for name, _ in PIPE_SIZES if pipe.get(name)]
+    lines += [('fitting', name, quantity) for name, quantity in sorted(fittings.items())]
+    if valves:
+        lines.append(('valve', 'zone_valve', valves))
+
+    prices = price_table()
+    items, total = [], None
+    for category, name, quantity in lines:
+        unit, unit_price = prices.get((category, name), ('ft' if category == 'pipe' else 'each', None))
+        cost = round(unit_price * quantity, 2) if unit_price is not None else None
+        if cost is not None:
+            total = (total or 0) + cost
+        items.append({
+            'category': category, 'type': name, 'quantity': quantity,
+            'unit': unit, 'unit_price': unit_price, 'cost': cost,
+        })
+    return items, (round(total, 2) if total is not None else None)
+
+
+def regenerate_bom(yard, force=False):
+    """
+    Rebuilds the project's BOM for a Yard (or yard id) unless it was already
+    generated from the yard's current revision. Returns the BillOfMaterials,
+    or None if the yard is gone.
+    """
+    if not isinstance(yard, Yard):
+        yard = Yard.objects.filter(pk=yard).first()
+        if yard is None:
+            return None
+    bom = BillOfMaterials.objects.filter(project_id=yard.project_id).first()
+    if bom is not None and bom.yard_revision == yard.revision and not force:
+        return bom
+
+    items, cost = build_bom(yard)
+    bom, _ = BillOfMaterials.objects.update_or_create(
+        project_id=yard.project_id,
+        defaults={'items': items, 'estimated_cost': cost, 'yard_revision': yard.revision, 'generated_at': timezone.now()},
+    )
+    return bom
@@ -0,0 +1,86 @@
+import shapely
+from shapely.errors import GEOSException, GeometryTypeError
+from shapely.geometry import mapping, shape
+
+GRID_SIZE = 0.01  # feet; sketch coordinates are snapped to this precision
+POLYGONAL_TYPES = ("Polygon", "MultiPolygon")
+
+
+class InvalidGeometry(ValueError):
+    pass
+
+
+def _polygonal_parts(geom):
+    """Drops the points and lines make_valid can leave behind a collapsed ring."""
+    parts = [part for part in shapely.get_parts(geom) if part.geom_type in POLYGONAL_TYPES]
+    if not parts:
+        return shapely.Polygon()
+    return shapely.union_all(parts, grid_size=GRID_SIZE)
+
+
+def normalize_geometry(geojson, polygonal=False):
+    """
+    Validates and normalizes a GeoJSON geometry for storage: invalid shapes are
+    repaired with make_valid, coordinates are snapped to GRID_SIZE and repeated
+    or collinear vertices are removed. Returns (geojson, bounds, area).
+
+    Raises InvalidGeometry if the geometry can't be parsed, is empty, or is not
+    polygonal when `polygonal` is set.
+    """
+    try:
+        geom = shape(geojson)
+    except (GEOSException, GeometryTypeError, AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+        raise InvalidGeometry(f"Unreadable geometry: {e}")
+    if geom.is_empty:
+        raise InvalidGeometry("Geometry is empty.")
+
+    was_polygonal = geom.geom_type in POLYGONAL_TYPES
+    if polygonal and not was_polygonal:
+        raise InvalidGeometry(f"Expected a Polygon or MultiPolygon, got {geom.geom_type}.")
+
+    if not geom.is_valid:
+        geom = shapely.make_valid(geom)
+        if was_polygonal:
+            geom = _polygonal_parts(geom)
+
+    geom = shapely.set_precision(geom, GRID_SIZE)
+    if was_polygonal:
+        # Douglas-Peucker at zero tolerance drops only redundant (collinear) vertices
+        geom = geom.simplify(0, preserve_topology=True)
+    else:
+        geom = shapely.remove_repeated_points(geom)
+
+    if geom.is_empty:
+        raise InvalidGeometry("Geometry collapses to nothing at the sketch precision.")
+    if was_polygonal and geom.geom_type not in POLYGONAL_TYPES:
+        geom = _polygonal_parts(geom)
+
+    return mapping(geom), geom.bounds, geom.area
+
+
+def _read(geojson):
+    if not geojson:
+        return None
+    try:
+        geom = shape(geojson)
+    except (GEOSException, GeometryTypeError, AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+    return None if geom.is_empty else geom
+
+
+def derived_geometry_fields(geojson):
+    """Bounding box, area and WKB columns kept alongside a stored GeoJSON geometry."""
+    geom = _read(geojson)
+    if geom is None:
+        return {'minx': None, 'miny': None, 'maxx': None, 'maxy': None, 'area': None, 'geometry_wkb': None}
+    minx, miny, maxx, maxy = geom.bounds
+    return {
+        'minx': minx, 'miny': miny, 'maxx': maxx, 'maxy': maxy,
+        'area': geom.area,
+        'geometry_wkb': shapely.to_wkb(geom),
+    }
+
+
+def geometries_from_wkb(values):
+    """Vectorized decode of WKB columns (bytes or memoryview; None stays empty)."""
+    return shapely.from_wkb([bytes(v) if v is not None else None for v in values])
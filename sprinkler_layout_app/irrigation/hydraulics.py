@@ -0,0 +1,188 @@
+"""
+Lateral pipe network and pressure check for a zone.
+
+Heads are joined by a minimum spanning tree (Prim's algorithm over a
+vectorized distance matrix) and the valve is tapped into the tree at its
+nearest head, found with an STRtree. Each segment carries the flow of every
+head downstream of it, is sized to the smallest pipe that keeps velocity
+under MAX_VELOCITY, and loses pressure per Hazen-Williams. A head is flagged
+when the supply pressure left after the valve and pipe losses is below its
+operating minimum.
+
+Units: feet, GPM, psi, inches for pipe diameters.
+"""
+from collections import defaultdict
+
+import numpy as np
+import shapely
+
+from .models import SprinklerHead
+from .utils import location_point
+
+# Nominal size and inside diameter of Schedule 40 PVC
+PIPE_SIZES = (
+    ('1/2"', 0.622),
+    ('3/4"', 0.824),
+    ('1"', 1.049),
+    ('1-1/4"', 1.380),
+    ('1-1/2"', 1.610),
+    ('2"', 2.067),
+)
+HAZEN_WILLIAMS_C = 150  # PVC
+MAX_VELOCITY = 5.0  # ft/s; above this water hammer becomes a risk
+FITTING_ALLOWANCE = 1.1  # tees and elbows add roughly 10% to straight-pipe loss
+VALVE_LOSS = 3.0  # psi across the zone valve
+MIN_HEAD_PRESSURE = {'spray': 30.0, 'rotor': 40.0, 'rotary': 30.0, 'bubbler': 15.0, 'drip': 15.0}
+DEFAULT_MIN_PRESSURE = 30.0
+
+_DIAMETERS = np.array([d for _, d in PIPE_SIZES])
+
+
+def minimum_spanning_tree(points, root=0):
+    """
+    Prim's algorithm on the dense distance matrix. Returns (order, parent,
+    length): nodes in the order they joined the tree, each node's parent
+    (-1 for the root) and the length of the edge to it.
+    """
+    n = len(points)
+    # Squared distances order edges the same and skip n^2 square roots
+    dx = points[:, 0, np.newaxis] - points[np.newaxis, :, 0]
+    dy = points[:, 1, np.newaxis] - points[np.newaxis, :, 1]
+    distances = dx * dx + dy * dy
+    parent = np.full(n, -1)
+    best = distances[root].copy()
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[root] = True
+    best[root] = np.inf
+    order = [root]
+    nearest = np.full(n, root)
+    for _ in range(n - 1):
+        node = best.argmin()
+        parent[node] = nearest[node]
+        order.append(node)
+        in_tree[node] = True
+        best[node] = np.inf
+        row = distances[node]
+        closer = row < best
+        closer &= ~in_tree
+        best[closer] = row[closer]
+        nearest[closer] = node
+    length = np.where(parent >= 0, np.sqrt(distances[np.arange(n), np.maximum(parent, 0)]), 0.0)
+    return np.array(order), parent, length
+
+
+def pipe_size_index(flow):
+    """Smallest pipe keeping velocity <= MAX_VELOCITY; the largest size if none does."""
+    velocity = 0.4085 * flow[:, np.newaxis] / _DIAMETERS[np.newaxis, :] ** 2
+    fits = velocity <= MAX_VELOCITY
+    return np.where(fits.any(axis=1), fits.argmax(axis=1), len(PIPE_SIZES) - 1)
+
+
+def friction_loss(flow, diameter, length):
+    """Hazen-Williams loss in psi for pipe runs (flow in GPM, diameter in inches, length in feet)."""
+    per_foot = 4.52 * flow ** 1.852 / (HAZEN_WILLIAMS_C ** 1.852 * diameter ** 4.8704)
+    return per_foot * length * FITTING_ALLOWANCE
+
+
+def solve_zone(heads, supply_pressure, valve=None):
+    """
+    Lays out and checks a zone's lateral. `heads` are dicts with id, x, y,
+    flow_rate and type; `valve` is an (x, y) tap point, defaulting to the
+    heads' centroid. Returns segments, per-head pressures and pipe totals.
+    """
+    result = {
+        'supply_pressure': supply_pressure,
+        'total_flow': round(sum(h['flow_rate'] for h in heads), 2),
+        'valve': None,
+        'segments': [],
+        'heads': [],
+        'pipe_lengths': {},
+        'low_pressure_heads': 0,
+    }
+    if not heads:
+        return result
+
+    points = np.array([(h['x'], h['y']) for h in heads], dtype=float)
+    flows = np.array([h['flow_rate'] for h in heads], dtype=float)
+    valve_assumed = valve is None
+    valve = np.asarray(points.mean(axis=0) if valve is None else valve, dtype=float)
+    result['valve'] = {'x': round(float(valve[0]), 2), 'y': round(float(valve[1]), 2), 'assumed': valve_assumed}
+
+    # Root the tree at the head nearest the valve so the valve feeds it directly
+    tree = shapely.STRtree(shapely.points(points))
+    root = int(tree.query_nearest(shapely.Point(*valve))[0])
+    order, parent, length = minimum_spanning_tree(points, root)
+    length[root] = float(np.hypot(*(points[root] - valve)))
+
+    # Each segment ends at a head and carries everything downstream of it
+    carried = flows.copy()
+    for node in order[:0:-1]:
+        carried[parent[node]] += carried[node]
+
+    size = pipe_size_index(carried)
+    diameter = _DIAMETERS[size]
+    loss = friction_loss(carried, diameter, length)
+
+    pressure = np.empty(len(heads))
+    pressure[root] = supply_pressure - VALVE_LOSS - loss[root]
+    for node in order[1:]:
+        pressure[node] = pressure[parent[node]] - loss[node]
+
+    lengths = {}
+    for node in order:
+        head = heads[node]
+        name = PIPE_SIZES[size[node]][0]
+        lengths[name] = lengths.get(name, 0.0) + float(length[node])
+        result['segments'].append({
+            'from': 'valve' if node == root else heads[parent[node]]['id'],
+            'to': head['id'],
+            'length': round(float(length[node]), 2),
+            'flow': round(float(carried[node]), 2),
+            'size': name,
+            'velocity': round(float(0.4085 * carried[node] / diameter[node] ** 2), 2),
+            'friction_loss': round(float(loss[node]), 3),
+        })
+        minimum = MIN_HEAD_PRESSURE.get(str(head.get('type', '')).lower(), DEFAULT_MIN_PRESSURE)
+        low = bool(pressure[node] < minimum)
+        result['low_pressure_heads'] += low
+        result['heads'].append({
+            'id': head['id'],
+            'pressure': round(float(pressure[node]), 2),
+            'min_pressure': minimum,
+            'low_pressure': low,
+        })
+
+    result['pipe_lengths'] = {name: round(total, 2) for name, total in lengths.items()}
+    return result
+
+
+def _located(rows):
+    """Splits head rows into solver inputs and the ids of heads without a usable location."""
+    heads, unplaced = [], []
+    for head in rows:
+        point = location_point(head.pop('location'))
+        if point is not None:
+            heads.append({**head, 'x': point[0], 'y': point[1]})
+        else:
+            unplaced.append(head['id'])
+    return heads, unplaced
+
+
+def zone_hydraulics(zone):
+    """Solves a Zone from its located heads, its valve location and the yard's water pressure."""
+    heads, unplaced = _located(zone.sprinkler_heads.values('id', 'type', 'flow_rate', 'location'))
+    result = solve_zone(heads, zone.yard.water_pressure, location_point(zone.valve_location))
+    return {'zone': zone.id, **result, 'unplaced_heads': unplaced}
+
+
+def yard_hydraulics(yard):
+    """Solves every zone of a yard from two queries: {zone id: result}."""
+    rows = defaultdict(list)
+    for head in SprinklerHead.objects.filter(zone__yard=yard).values('id', 'zone_id', 'type', 'flow_rate', 'location'):
+        rows[head.pop('zone_id')].append(head)
+
+    results = {}
+    for zone_id, valve in yard.zones.values_list('id', 'valve_location'):
+        heads, unplaced = _located(rows.get(zone_id, []))
+        results[zone_id] = {'zone': zone_id, **solve_zone(heads, yard.water_pressure, location_point(valve)), 'unplaced_heads': unplaced}
+    return results
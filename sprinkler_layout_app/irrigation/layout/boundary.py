@@ -0,0 +1,125 @@
+"""
+Boundary head placement.
+
+Every corner of an area's outline gets a part-circle head whose arc spans
+the interior angle there, so concave corners get arcs wider than 180°
+instead of a wedge pointing out of the yard. Each edge then gets 180° heads
+at the widest even spacing that stays within the head-to-head target, so
+short edges aren't given a head they don't need and long ones aren't left
+with a gap at the end.
+
+Outlines are cleaned first: vertices within COLLINEAR_TOLERANCE of a
+straight line are merged away, and corners closer than the dedupe distance
+are collapsed into one, so a digitized curve or a sketching jog doesn't get
+a head per vertex. A HeadIndex (spatial hash) then drops any head that
+lands within the dedupe distance of one already placed, e.g. on both sides
+of a sharp spike or where two parts of an area touch.
+"""
+import math
+
+import shapely
+from shapely.geometry.polygon import orient
+
+COLLINEAR_TOLERANCE = 0.5  # feet a merged vertex may sit off the straightened edge
+SPACING_STRETCH = 0.05  # an edge this far past whole spacings is stretched rather than given another head
+DEDUPE_FRACTION = 0.25  # of head-to-head spacing; heads closer than this are redundant
+
+
+class HeadIndex:
+    """
+    Spatial hash of head positions in square cells of `cell` feet, so nearby
+    heads are found by looking at the 3x3 cells around a point instead of
+    every head placed so far. `near` is exact for distances up to `cell`.
+    """
+
+    def __init__(self, cell):
+        self.cell = cell
+        self._cells = {}
+
+    def _key(self, x, y):
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def add(self, x, y):
+        self._cells.setdefault(self._key(x, y), []).append((x, y))
+
+    def near(self, x, y, distance):
+        """Whether a head lies within `distance` (<= cell) of (x, y)."""
+        cx, cy = self._key(x, y)
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for hx, hy in self._cells.get((i, j), ()):
+                    if math.hypot(hx - x, hy - y) <= distance:
+                        return True
+        return False
+
+
+def clean_ring(polygon, min_edge):
+    """
+    Exterior vertices of `polygon`, counterclockwise and without the closing
+    repeat, after merging near-collinear runs and collapsing edges shorter
+    than `min_edge`.
+    """
+    polygon = orient(polygon, 1.0)
+    simplified = shapely.simplify(polygon, COLLINEAR_TOLERANCE)
+    if simplified.geom_type == 'Polygon' and not simplified.is_empty:
+        polygon = orient(simplified, 1.0)
+    coords = list(polygon.exterior.coords[:-1])
+
+    kept = []
+    for point in coords:
+        if kept and math.dist(kept[-1], point) < min_edge:
+            continue
+        kept.append(point)
+    while len(kept) > 3 and math.dist(kept[-1], kept[0]) < min_edge:
+        kept.pop()
+    return kept if len(kept) >= 3 else coords
+
+
+def _heading(start, end):
+    return math.degrees(math.atan2(end[1] - start[1], end[0] - start[0])) % 360
+
+
+def outline_rings(area, spacing):
+    """Cleaned exterior rings (see clean_ring) of each polygon in `area`."""
+    return [clean_ring(polygon, spacing * DEDUPE_FRACTION) for polygon in getattr(area, 'geoms', [area])]
+
+
+def _place(heads, index, x, y, radius, angle, direction):
+    if index.near(x, y, index.cell * DEDUPE_FRACTION):
+        return
+    index.add(x, y)
+    heads.append({"x": x, "y": y, "radius": radius, "angle": angle, "direction": direction})
+
+
+def corner_heads(rings, radius, index):
+    """
+    A head at every ring vertex, its arc spanning the interior angle there.
+    `direction` is where the arc starts, counterclockwise, as elsewhere in
+    the layout code. Heads are added to `index`, whose cell is the
+    head-to-head spacing.
+    """
+    heads = []
+    for coords in rings:
+        for i, curr in enumerate(coords):
+            prev, nxt = coords[i - 1], coords[(i + 1) % len(coords)]
+            # With the interior on the left, the corner's interior sweeps
+            # counterclockwise from the outgoing edge back to the incoming one
+            outgoing, incoming = _heading(curr, nxt), _heading(curr, prev)
+            _place(heads, index, curr[0], curr[1], radius, round((incoming - outgoing) % 360, 6), outgoing)
+    return heads
+
+
+def edge_heads(rings, radius, index):
+    """180° heads spraying inward along each ring edge, evenly spaced per edge; see corner_heads."""
+    spacing = index.cell
+    heads = []
+    for coords in rings:
+        for i, start in enumerate(coords):
+            end = coords[(i + 1) % len(coords)]
+            intervals = max(1, math.ceil(math.dist(start, end) / (spacing * (1 + SPACING_STRETCH))))
+            direction = _heading(start, end)
+            for j in range(1, intervals):
+                x = start[0] + (end[0] - start[0]) * j / intervals
+                y = start[1] + (end[1] - start[1]) * j / intervals
+                _place(heads, index, x, y, radius, 180, direction)
+    return heads
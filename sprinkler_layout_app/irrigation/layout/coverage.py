@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+import shapely
+
+MAX_RASTER_CELLS = 512  # cells along the longest side of a coverage raster
+MIN_CELL_SIZE = 0.25  # feet
+
+
+def raster_cell_size(bounds):
+    minx, miny, maxx, maxy = bounds
+    return max(max(maxx - minx, maxy - miny) / MAX_RASTER_CELLS, MIN_CELL_SIZE)
+
+
+def head_footprint(head, origin, cell_size, shape):
+    """
+    Returns (row_slice, col_slice, mask) for the cells whose centers a head
+    waters. Only the head's bounding square is evaluated, so the cost depends
+    on the throw radius, not on the raster size.
+    """
+    x0, y0 = origin
+    rows, cols = shape
+    x, y, r = head["x"], head["y"], head["radius"]
+
+    c0 = max(0, int(math.floor((x - r - x0) / cell_size)))
+    c1 = min(cols, int(math.ceil((x + r - x0) / cell_size)) + 1)
+    r0 = max(0, int(math.floor((y - r - y0) / cell_size)))
+    r1 = min(rows, int(math.ceil((y + r - y0) / cell_size)) + 1)
+    if c0 >= c1 or r0 >= r1:
+        return slice(0, 0), slice(0, 0), np.zeros((0, 0), dtype=bool)
+
+    dx = (x0 + (np.arange(c0, c1) + 0.5) * cell_size - x)[np.newaxis, :]
+    dy = (y0 + (np.arange(r0, r1) + 0.5) * cell_size - y)[:, np.newaxis]
+    mask = dx * dx + dy * dy <= r * r
+
+    angle = head.get("angle", 360)
+    if angle < 360:
+        # `direction` is the arc start angle, measured counterclockwise
+        bearing = (np.degrees(np.arctan2(dy, dx)) - head.get("direction", 0)) % 360
+        mask &= bearing <= angle
+    return slice(r0, r1), slice(c0, c1), mask
+
+
+def rasterize_coverage(sprinklers, bounds, cell_size=None):
+    """
+    Counts how many heads water each cell of a grid over `bounds`.
+    Returns (counts, origin, cell_size); row 0 is the bottom of the area.
+    """
+    cell_size = cell_size or raster_cell_size(bounds)
+    minx, miny, maxx, maxy = bounds
+    shape = (max(1, int(math.ceil((maxy - miny) / cell_size))),
+             max(1, int(math.ceil((maxx - minx) / cell_size))))
+    counts = np.zeros(shape, dtype=np.int16)
+    origin = (minx, miny)
+    for head in sprinklers:
+        rows, cols, mask = head_footprint(head, origin, cell_size, shape)
+        counts[rows, cols] += mask
+    return counts, origin, cell_size
+
+
+def area_mask(area, origin, cell_size, shape):
+    """Boolean grid of the cells whose centers fall inside `area`."""
+    x0, y0 = origin
+    xs = x0 + (np.arange(shape[1]) + 0.5) * cell_size
+    ys = y0 + (np.arange(shape[0]) + 0.5) * cell_size
+    gx, gy = np.meshgrid(xs, ys)
+    shapely.prepare(area)
+    return shapely.contains_xy(area, gx, gy)
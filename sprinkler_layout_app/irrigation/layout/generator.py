@@ -1,13 +1,17 @@
-from shapely.geometry import Point, LineString
+from shapely.geometry import Point
 from shapely.affinity import translate, rotate
 from shapely.geometry import Polygon
 from shapely.ops import nearest_points
-from irrigation.layout_utils import parse_yard_geometry
+from irrigation.layout.boundary import HeadIndex, corner_heads, edge_heads, outline_rings
+from irrigation.layout_utils import parse_yard_hydrozones
 import math
+import time
 
 SPRINKLER_RADIUS = 10  # feet
+LAYOUT_VERSION = 1  # bump whenever a change here or in boundary.py alters generated layouts
 COVERAGE_OVERLAP_FACTOR = 0.95
 #MAX_SPRINKLERS = 1000  # failsafe cap
+INTERIOR_BATCH_SIZE = 50  # interior heads per progress batch
 
 def calculate_angle(p1, p2, p3):
     """Returns the interior angle at point p2 (in degrees)"""
@@ -52,106 +56,81 @@ def create_sprinkler_sector(x, y, radius, angle, direction):
     sector = rotate(sector, direction, origin=(0, 0), use_radians=False)
     return translate(sector, xoff=x, yoff=y)
 
-def generate_sprinkler_layout(yard):
-    from shapely.geometry import LineString
-    usable_area = parse_yard_geometry(yard)
+def generate_sprinkler_layout(yard, progress=None):
+    return layout_for_hydrozones(parse_yard_hydrozones(yard), progress)
+
+def layout_for_hydrozones(hydrozones, progress=None):
+    """
+    Lays out each hydrozone (see build_hydrozones) on its own, so no head
+    waters across microclimates. Heads carry their zone's 1-based index as
+    "hydrozone"; `progress` is as for layout_for_area.
+    """
+    sprinklers = []
+    for stage, heads, elapsed, done in iter_hydrozone_layout(hydrozones):
+        sprinklers.extend(heads)
+        if progress is not None:
+            progress(stage, heads, elapsed, done)
+    return sprinklers
+
+def iter_hydrozone_layout(hydrozones):
+    """iter_layout over every polygon of every hydrozone, tagging the heads with the zone."""
+    for zone_id, zone in enumerate(hydrozones, 1):
+        for polygon in getattr(zone["geometry"], "geoms", [zone["geometry"]]):
+            for stage, heads, elapsed, done in iter_layout(polygon):
+                for head in heads:
+                    head["hydrozone"] = zone_id
+                yield stage, heads, elapsed, done
+
+def layout_for_area(usable_area, progress=None):
+    """
+    Places heads over an already-parsed usable area; needs no database access.
+    `progress(stage, heads, elapsed, done)` is called with each batch of new
+    heads as it is placed: elapsed is seconds since the stage began, and done
+    marks the stage's last batch.
+    """
+    sprinklers = []
+    for stage, heads, elapsed, done in iter_layout(usable_area):
+        sprinklers.extend(heads)
+        if progress is not None:
+            progress(stage, heads, elapsed, done)
+    return sprinklers
+
+def iter_layout(usable_area):
+    """The passes behind layout_for_area, yielding (stage, heads, elapsed, done) batches."""
     if usable_area.is_empty:
-        return []
+        return
 
     sprinklers = []
+    started = time.perf_counter()
     spacing = SPRINKLER_RADIUS * 1.0  # head-to-head spacing
-    coords = list(usable_area.exterior.coords[:-1])
-
-    # === 1. Place corner sprinklers with smart arcs ===
-    for i in range(len(coords)):
-        prev = coords[i - 1]
-        curr = coords[i]
-        nxt = coords[(i + 1) % len(coords)]
-
-        v1 = (curr[0] - prev[0], curr[1] - prev[1])
-        v2 = (nxt[0] - curr[0], nxt[1] - curr[1])
-
-        len_v1 = math.hypot(*v1)
-        len_v2 = math.hypot(*v2)
-
-        if len_v1 < 1e-6 or len_v2 < 1e-6:
-            continue
-
-        # Compute interior corner angle
-        dot = v1[0]*v2[0] + v1[1]*v2[1]
-        corner_angle = math.degrees(math.acos(max(-1, min(1, dot / (len_v1 * len_v2)))))
-
-        if corner_angle >= 180:
-            continue  # skip concave or straight corners
-
-        # Compute spray arc needed to fill the exterior corner
-        spray_angle = 180 - corner_angle
-
-        # Bisector direction (rough inward spray direction)
-        unit_v1 = (v1[0] / len_v1, v1[1] / len_v1)
-        unit_v2 = (v2[0] / len_v2, v2[1] / len_v2)
-        bisector = (-unit_v1[0] - unit_v2[0], -unit_v1[1] - unit_v2[1])
-        bisector_angle = math.degrees(math.atan2(bisector[1], bisector[0])) % 360
-
-        # Adjust to arc starting angle (counterclockwise)
-        adjusted_direction = (bisector_angle + 90 - spray_angle / 2) % 360
-
-        sprinklers.append({
-            "x": curr[0],
-            "y": curr[1],
-            "radius": SPRINKLER_RADIUS,
-            "angle": spray_angle,
-            "direction": adjusted_direction
-        })
-
-    # === 2. Place 180° edge sprinklers ===
-    for i in range(len(coords)):
-        start = coords[i]
-        end = coords[(i + 1) % len(coords)]
-
-        segment = LineString([start, end])
-        length = segment.length
-        num_heads = max(1, int(length // spacing))
-        dx = (end[0] - start[0]) / num_heads
-        dy = (end[1] - start[1]) / num_heads
-
-        for j in range(1, num_heads):
-            x = start[0] + dx * j
-            y = start[1] + dy * j
-
-            edge_vector = (end[0] - start[0], end[1] - start[1])
-            direction = math.degrees(math.atan2(edge_vector[1], edge_vector[0])) + 90
-            direction = (direction + 90) % 360  # rotate to face inward
-
-            sprinklers.append({
-                "x": x,
-                "y": y,
-                "radius": SPRINKLER_RADIUS,
-                "angle": 180,
-                "direction": direction
-            })
+    rings = outline_rings(usable_area, spacing)
+    placed = HeadIndex(spacing)  # every head so far, for dedupe and coverage checks
+
+    # === 1. Place corner sprinklers with arcs spanning the corner (wider than 180° where concave) ===
+    sprinklers.extend(corner_heads(rings, SPRINKLER_RADIUS, placed))
+
+    yield "corners", sprinklers[:], time.perf_counter() - started, True
+
+    # === 2. Place 180° edge sprinklers, evenly spaced per edge ===
+    started, mark = time.perf_counter(), len(sprinklers)
+    sprinklers.extend(edge_heads(rings, SPRINKLER_RADIUS, placed))
+
+    yield "edges", sprinklers[mark:], time.perf_counter() - started, True
 
     # === 3. Interior 360° sprinkler heads ===
+    started, mark = time.perf_counter(), len(sprinklers)
     minx, miny, maxx, maxy = usable_area.bounds
     spacing = SPRINKLER_RADIUS * 1.0  # same head-to-head spacing
 
     EFFECTIVE_COVERAGE_RADIUS = SPRINKLER_RADIUS * COVERAGE_OVERLAP_FACTOR
 
-    def is_covered(x, y):
-        for s in sprinklers:
-            dx = s["x"] - x
-            dy = s["y"] - y
-            dist = math.hypot(dx, dy)
-            if dist <= EFFECTIVE_COVERAGE_RADIUS:
-                return True
-        return False
-
     y = miny + spacing / 2
     while y < maxy:
         x = minx + spacing / 2
         while x < maxx:
             point = Point(x, y)
-            if usable_area.contains(point) and not is_covered(x, y):
+            if usable_area.contains(point) and not placed.near(x, y, EFFECTIVE_COVERAGE_RADIUS):
+                placed.add(x, y)
                 sprinklers.append({
                     "x": x,
                     "y": y,
@@ -159,7 +138,10 @@ def generate_sprinkler_layout(yard):
                     "angle": 360,
                     "direction": 0  # 360° heads don't need orientation
                 })
+                if len(sprinklers) - mark >= INTERIOR_BATCH_SIZE:
+                    yield "interior", sprinklers[mark:], time.perf_counter() - started, False
+                    mark = len(sprinklers)
             x += spacing
         y += spacing
 
-    return sprinklers
+    yield "interior", sprinklers[mark:], time.perf_counter() - started, True
@@ -0,0 +1,249 @@
+"""
+Incremental coverage for manual head adjustment.
+
+A CoverageSession keeps the per-cell head counts of a layout over a yard's
+usable area. Moving, adding or removing a head updates only the cells in
+that head's bounding square (see head_footprint) and reports the dry and
+over-watered cells inside just that square, so a drag costs the same on a
+small lot as on a large estate. Running totals are adjusted from the same
+window, never recounted.
+
+Sessions are kept in Django's cache for SESSION_TTL seconds after last use,
+so a delta can land on any worker process as long as the cache is shared
+(Redis, Memcached, database). With the default per-process LocMemCache that
+only holds for single-process deployments; more workers need sticky routing.
+The raster is cached in TILE_CELLS-square tiles next to a small header, and
+a delta loads and stores back only the tiles its heads touch. Tiles live
+for at most SESSION_MAX_AGE seconds, so no session outlives that. Each delta
+locks its session through the cache, so concurrent deltas to one session
+apply one after the other instead of overwriting each other.
+"""
+import secrets
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.core.cache import cache
+
+from irrigation.layout.coverage import area_mask, head_footprint, rasterize_coverage
+
+OVER_COVERAGE = 3  # heads; head-to-head spacing puts two on most cells, a third is waste
+MAX_HEAD_RADIUS = 100  # feet; bounds the per-edit window
+MAX_HEADS = 5000  # posted heads per session
+SESSION_TTL = 30 * 60  # seconds since last use
+SESSION_MAX_AGE = 8 * 60 * 60  # seconds since the session started
+TILE_CELLS = 128  # raster cells along each side of a cached tile
+LOCK_TIMEOUT = 10  # seconds a crashed request can hold a session's lock
+LOCK_WAIT = 2  # seconds a delta waits for another on the same session
+
+
+def parse_head(data):
+    """A head dict from request data; raises ValueError if it's unusable."""
+    if not isinstance(data, dict):
+        raise ValueError("A head must be an object with x, y and radius.")
+    try:
+        head = {key: float(data[key]) for key in ("x", "y", "radius")}
+        head["angle"] = float(data.get("angle", 360))
+        head["direction"] = float(data.get("direction", 0))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("A head needs numeric x, y and radius (angle and direction are optional).")
+    if not all(np.isfinite(list(head.values()))):
+        raise ValueError("Head values must be finite.")
+    if not 0 < head["radius"] <= MAX_HEAD_RADIUS:
+        raise ValueError(f"Head radius must be between 0 and {MAX_HEAD_RADIUS} feet.")
+    return head
+
+
+class CoverageSession:
+    def __init__(self, yard_id, revision, usable_area, sprinklers):
+        self.yard_id = str(yard_id)
+        self.revision = revision
+        counts, self.origin, self.cell_size = rasterize_coverage(sprinklers, usable_area.bounds)
+        inside = area_mask(usable_area, self.origin, self.cell_size, counts.shape)
+        self.shape = counts.shape
+        self.usable = int(np.count_nonzero(inside))
+        self.under = int(np.count_nonzero(inside & (counts == 0)))
+        self.over = int(np.count_nonzero(inside & (counts >= OVER_COVERAGE)))
+        self.tiles = {
+            tile: (counts[in_raster].copy(), inside[in_raster].copy())
+            for tile, in_raster, _, _ in self._tiles(slice(0, self.shape[0]), slice(0, self.shape[1]))
+        }
+        self.changed = set(self.tiles)
+        self.load_tiles = None  # set by CoverageSessions.checkout
+
+    def __getstate__(self):
+        # Tiles are cached under their own keys
+        state = dict(self.__dict__)
+        for name in ("tiles", "changed", "load_tiles"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, tiles={}, changed=set(), load_tiles=None)
+
+    def _tiles(self, rows, cols):
+        """
+        (tile, raster index, tile index, window index) for each tile overlapping
+        the window `rows` x `cols`, indexes being the overlap in each array.
+        """
+        for i in range(rows.start // TILE_CELLS, (rows.stop - 1) // TILE_CELLS + 1):
+            r0, r1 = max(rows.start, i * TILE_CELLS), min(rows.stop, (i + 1) * TILE_CELLS)
+            for j in range(cols.start // TILE_CELLS, (cols.stop - 1) // TILE_CELLS + 1):
+                c0, c1 = max(cols.start, j * TILE_CELLS), min(cols.stop, (j + 1) * TILE_CELLS)
+                yield (
+                    (i, j),
+                    np.s_[r0:r1, c0:c1],
+                    np.s_[r0 - i * TILE_CELLS:r1 - i * TILE_CELLS, c0 - j * TILE_CELLS:c1 - j * TILE_CELLS],
+                    np.s_[r0 - rows.start:r1 - rows.start, c0 - cols.start:c1 - cols.start],
+                )
+
+    def window(self, rows, cols):
+        """Copies of the head counts and the inside-the-area mask over a window."""
+        overlaps = list(self._tiles(rows, cols))
+        missing = [tile for tile, _, _, _ in overlaps if tile not in self.tiles]
+        if missing:
+            self.tiles.update(self.load_tiles(missing))
+        shape = (rows.stop - rows.start, cols.stop - cols.start)
+        counts, inside = np.empty(shape, dtype=np.int16), np.empty(shape, dtype=bool)
+        for tile, _, in_tile, in_window in overlaps:
+            tile_counts, tile_inside = self.tiles[tile]
+            counts[in_window] = tile_counts[in_tile]
+            inside[in_window] = tile_inside[in_tile]
+        return counts, inside
+
+    def _store(self, rows, cols, counts):
+        for tile, _, in_tile, in_window in self._tiles(rows, cols):
+            self.tiles[tile][0][in_tile] = counts[in_window]
+            self.changed.add(tile)
+
+    def totals(self):
+        cell_area = self.cell_size ** 2
+        return {
+            "usable_area": round(self.usable * cell_area, 2),
+            "under_covered_area": round(self.under * cell_area, 2),
+            "over_covered_area": round(self.over * cell_area, 2),
+        }
+
+    def regions(self, rows=None, cols=None):
+        """Dry and over-watered cells of a window (default everywhere) as [minx, miny, maxx, maxy] row runs."""
+        rows = rows or slice(0, self.shape[0])
+        cols = cols or slice(0, self.shape[1])
+        counts, inside = self.window(rows, cols)
+        return {
+            "under_covered": self._runs(inside & (counts == 0), rows.start, cols.start),
+            "over_covered": self._runs(inside & (counts >= OVER_COVERAGE), rows.start, cols.start),
+        }
+
+    def _runs(self, mask, row0, col0):
+        edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        _, stops = np.nonzero(edges == -1)
+        x0, y0 = self.origin
+        size = self.cell_size
+        return [
+            [round(x0 + (col0 + start) * size, 2), round(y0 + (row0 + row) * size, 2),
+             round(x0 + (col0 + stop) * size, 2), round(y0 + (row0 + row + 1) * size, 2)]
+            for row, start, stop in zip(rows.tolist(), starts.tolist(), stops.tolist())
+        ]
+
+    def apply(self, remove=None, add=None):
+        """
+        Takes `remove` out of the coverage and puts `add` in (a move is both).
+        Returns one entry per touched window with its bounds and its regions
+        after the change, which replace whatever the client showed there.
+
+        Raises ValueError, changing nothing, if `remove` waters a cell no head
+        covers, i.e. it was never added.
+        """
+        changes = []
+        for head, step in ((remove, -1), (add, 1)):
+            if head is None:
+                continue
+            rows, cols, mask = head_footprint(head, self.origin, self.cell_size, self.shape)
+            if not mask.size:
+                continue
+            window, inside = self.window(rows, cols)
+            if step < 0 and window[mask].min(initial=1) < 1:
+                # The remove comes first, so nothing has changed yet
+                raise ValueError("The removed head isn't in this coverage session.")
+            self.under -= int(np.count_nonzero(inside & (window == 0)))
+            self.over -= int(np.count_nonzero(inside & (window >= OVER_COVERAGE)))
+            window += step * mask.astype(window.dtype)
+            self.under += int(np.count_nonzero(inside & (window == 0)))
+            self.over += int(np.count_nonzero(inside & (window >= OVER_COVERAGE)))
+            self._store(rows, cols, window)
+
+            x0, y0 = self.origin
+            size = self.cell_size
+            changes.append({
+                "bounds": [round(x0 + cols.start * size, 2), round(y0 + rows.start * size, 2),
+                           round(x0 + cols.stop * size, 2), round(y0 + rows.stop * size, 2)],
+                **self.regions(rows, cols),
+            })
+        return changes, self.totals()
+
+
+class SessionBusy(Exception):
+    pass
+
+
+class SessionExpired(Exception):
+    """Part of a session has been evicted from the cache (or is past SESSION_MAX_AGE)."""
+
+
+class CoverageSessions:
+    """
+    Sessions in Django's cache by yard and id: a header (the session without
+    its tiles) expiring SESSION_TTL seconds after last use, and the tiles.
+    """
+
+    def _key(self, session_id, yard_id):
+        return f"coverage-session:{yard_id}:{session_id}"
+
+    def _save(self, key, session, timeout):
+        tiles = {f"{key}:tile:{i}:{j}": session.tiles[i, j] for i, j in session.changed}
+        cache.set_many(tiles, SESSION_MAX_AGE)
+        session.changed.clear()
+        cache.set(key, session, timeout)
+
+    def create(self, session):
+        session_id = secrets.token_urlsafe(12)
+        self._save(self._key(session_id, session.yard_id), session, SESSION_TTL)
+        return session_id
+
+    @contextmanager
+    def checkout(self, session_id, yard_id):
+        """
+        Locks a session and yields it (None if it's gone), storing it back
+        afterwards. Its tiles are fetched as it reads them. Raises SessionBusy
+        if another request holds the lock for longer than LOCK_WAIT seconds,
+        and SessionExpired if a tile has left the cache.
+        """
+        key = self._key(session_id, yard_id)
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(f"{key}:lock", 1, LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise SessionBusy()
+            time.sleep(0.01)
+        try:
+            session = cache.get(key)
+            if session is not None:
+                session.load_tiles = lambda tiles: self._load(key, tiles)
+            yield session
+            if session is not None:
+                self._save(key, session, SESSION_TTL)
+        except SessionExpired:
+            cache.delete(key)
+            raise
+        finally:
+            cache.delete(f"{key}:lock")
+
+    def _load(self, key, tiles):
+        keys = {f"{key}:tile:{i}:{j}": (i, j) for i, j in tiles}
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            raise SessionExpired()
+        return {keys[name]: tile for name, tile in found.items()}
+
+
+coverage_sessions = CoverageSessions()
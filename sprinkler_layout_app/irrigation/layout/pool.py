@@ -0,0 +1,168 @@
+"""
+Process pool for layout generation.
+
+Parsing a sketch and placing heads is pure CPU work. Run in an async view
+it would stall the event loop, and in a thread it would hold the GIL, so
+the async layout endpoint ships the yard's raw element rows to a small pool
+of worker processes instead. The pool admits at most MAX_PENDING jobs at a
+time (running plus queued); beyond that `submit` raises PoolSaturated and
+the view answers 429, rather than letting a burst of heavy requests queue
+up behind each other.
+
+With WORKERS = 0 jobs run on a thread in this process, which is what the
+test suite and single-process development servers use.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def pool_settings():
+    return {
+        'WORKERS': 2,
+        'MAX_PENDING': 8,
+        **getattr(settings, 'IRRIGATION_LAYOUT_POOL', {}),
+    }
+
+
+# Worker entry points. Spawned workers import this module before Django is
+# set up, so it must not import models at the top level.
+def _init_worker():
+    import django
+    django.setup()
+
+
+def compute_layout(rows):
+    """
+    Layout payload from (type, geometry_wkb, geometry) element rows; the
+    GeoJSON is only read for rows saved before the binary column existed.
+    """
+    import numpy as np
+    import shapely
+    from shapely.geometry import shape
+
+    from irrigation.geometry import geometries_from_wkb
+    from irrigation.layout_utils import build_hydrozones
+
+    types = np.array([element_type for element_type, _, _ in rows], dtype=object)
+    geoms = geometries_from_wkb([wkb for _, wkb, _ in rows])
+    for i, (_, wkb, geojson) in enumerate(rows):
+        if wkb is None and geojson:
+            geoms[i] = shape(geojson)
+    keep = ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms) if len(geoms) else np.zeros(0, dtype=bool)
+    return layout_payload_for_zones(build_hydrozones(types[keep], geoms[keep]))
+
+
+def hydrozone_bounds(hydrozones):
+    """Bounds of the usable area the hydrozones tile, or None when there is none."""
+    if not hydrozones:
+        return None
+    bounds = [zone["geometry"].bounds for zone in hydrozones]
+    return (min(b[0] for b in bounds), min(b[1] for b in bounds),
+            max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+
+def layout_payload_for_zones(hydrozones):
+    from irrigation.layout.generator import layout_for_hydrozones
+    from irrigation.utils import sanitize_layout_data
+
+    sprinklers = layout_for_hydrozones(hydrozones)
+    heads = [0] * len(hydrozones)
+    for head in sprinklers:
+        heads[head["hydrozone"] - 1] += 1
+    return sanitize_layout_data({
+        "status": "sprinklers_generated",
+        "area_bounds": hydrozone_bounds(hydrozones),
+        "sprinklers": sprinklers,
+        "zones": [
+            {
+                "id": zone_id,
+                "exposure": zone["exposure"],
+                "sloped": zone["sloped"],
+                "area": round(zone["geometry"].area, 2),
+                "bounds": zone["geometry"].bounds,
+                "heads": count,
+            }
+            for zone_id, (zone, count) in enumerate(zip(hydrozones, heads), 1)
+        ],
+    })
+
+
+class LayoutPool:
+    def __init__(self):
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            workers = pool_settings()['WORKERS']
+            if workers:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='layout')
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= pool_settings()['MAX_PENDING']:
+                raise PoolSaturated()
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._executor = None
+                executor = self._get_executor()
+                future = executor.submit(fn, *args)
+            self._pending += 1
+        future.add_done_callback(self._release)
+        return executor, future
+
+    def submit(self, fn, *args):
+        """Queues fn(*args), raising PoolSaturated when MAX_PENDING jobs are already in flight."""
+        return self._submit(fn, *args)[1]
+
+    async def run(self, fn, *args):
+        """
+        Awaits fn(*args) in the pool. If a worker dies mid-job the pool is
+        replaced for later jobs and BrokenProcessPool is raised to the caller.
+        """
+        executor, future = self._submit(fn, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+layout_pool = LayoutPool()
@@ -0,0 +1,125 @@
+import io
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.colors import to_rgba
+from matplotlib.patches import Patch
+
+from irrigation.layout.coverage import area_mask, rasterize_coverage
+
+RENDER_FORMATS = ("png", "svg")
+RENDER_DPI = 100
+FIGURE_SIZE = (8, 8)  # inches
+
+COLORS = {
+    "usable": "#b7e4a8",
+    "obstacle": "#d9534f",
+    "coverage": "#1f77b4",
+    "overlap": "#ff7f0e",
+    "head": "#000000",
+}
+
+# One Agg figure per thread, cleared between renders instead of re-created
+_local = threading.local()
+
+
+def _figure():
+    fig = getattr(_local, "figure", None)
+    if fig is None:
+        fig = Figure(figsize=FIGURE_SIZE, dpi=RENDER_DPI)
+        FigureCanvasAgg(fig)
+        _local.figure = fig
+    fig.clear()
+    return fig
+
+
+def coverage_image(sprinklers, usable_area):
+    """
+    Rasterizes head coverage into an RGBA image plus its extent. Cells inside the
+    usable area watered by two or more heads are shaded as overlap. One raster
+    pass is much cheaper than drawing a patch per head on large layouts.
+    """
+    bounds = _expanded_bounds(usable_area.bounds, sprinklers)
+    counts, origin, cell_size = rasterize_coverage(sprinklers, bounds)
+    overlap = (counts >= 2) & area_mask(usable_area, origin, cell_size, counts.shape)
+
+    image = np.zeros(counts.shape + (4,), dtype=np.float32)
+    image[counts >= 1] = to_rgba(COLORS["coverage"], alpha=0.3)
+    image[overlap] = to_rgba(COLORS["overlap"], alpha=0.5)
+    extent = (origin[0], origin[0] + counts.shape[1] * cell_size,
+              origin[1], origin[1] + counts.shape[0] * cell_size)
+    return image, extent
+
+
+def _expanded_bounds(bounds, sprinklers):
+    """Area bounds grown to include every head's throw."""
+    minx, miny, maxx, maxy = bounds
+    for s in sprinklers:
+        minx = min(minx, s["x"] - s["radius"])
+        miny = min(miny, s["y"] - s["radius"])
+        maxx = max(maxx, s["x"] + s["radius"])
+        maxy = max(maxy, s["y"] + s["radius"])
+    return minx, miny, maxx, maxy
+
+
+def _polygons(geom):
+    if geom is None or geom.is_empty:
+        return []
+    if geom.geom_type == "Polygon":
+        return [geom]
+    return [g for g in getattr(geom, "geoms", []) if g.geom_type == "Polygon"]
+
+
+def render_layout(usable_area, sprinklers, obstacles=(), fmt="png"):
+    """
+    Draws the usable area, obstacles, head coverage arcs and overlap shading
+    with a legend, and returns the encoded image bytes.
+    """
+    if fmt not in RENDER_FORMATS:
+        raise ValueError(f"Unsupported render format: {fmt}")
+
+    fig = _figure()
+    # Fixed margins leave room for the legend without a second "tight" layout pass
+    fig.subplots_adjust(left=0.07, right=0.75, bottom=0.06, top=0.94)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_aspect("equal")
+    ax.set_title("Sprinkler Layout")
+
+    for polygon in _polygons(usable_area):
+        x, y = polygon.exterior.xy
+        ax.fill(x, y, fc=COLORS["usable"], ec="black", lw=0.8)
+        for interior in polygon.interiors:
+            x, y = interior.xy
+            ax.fill(x, y, fc="white", ec="black", lw=0.8)
+
+    for obstacle in obstacles:
+        for polygon in _polygons(obstacle):
+            x, y = polygon.exterior.xy
+            ax.fill(x, y, fc=COLORS["obstacle"], ec="black", alpha=0.6, lw=0.8, zorder=2.5)
+
+    if sprinklers and not usable_area.is_empty:
+        image, extent = coverage_image(sprinklers, usable_area)
+        ax.imshow(image, extent=extent, origin="lower", interpolation="nearest", zorder=2)
+        ax.plot([s["x"] for s in sprinklers], [s["y"] for s in sprinklers], "o",
+                color=COLORS["head"], markersize=3, zorder=3)
+
+    if not usable_area.is_empty:
+        minx, miny, maxx, maxy = usable_area.bounds
+        margin = 0.05 * max(maxx - minx, maxy - miny)
+        ax.set_xlim(minx - margin, maxx + margin)
+        ax.set_ylim(miny - margin, maxy + margin)
+    ax.legend(handles=[
+        Patch(fc=COLORS["usable"], ec="black", label="Usable area"),
+        Patch(fc=COLORS["obstacle"], alpha=0.6, label="Obstacle"),
+        Patch(fc=COLORS["coverage"], alpha=0.3, label="Coverage"),
+        Patch(fc=COLORS["overlap"], alpha=0.5, label="Overlap"),
+        Patch(fc=COLORS["head"], label=f"Heads ({len(sprinklers)})"),
+    ], loc="upper left", bbox_to_anchor=(1.01, 1.0), fontsize="small")
+
+    buffer = io.BytesIO()
+    # Fast zlib level: layout images are flat colour and barely shrink further
+    options = {"pil_kwargs": {"compress_level": 1}} if fmt == "png" else {}
+    fig.savefig(buffer, format=fmt, **options)
+    return buffer.getvalue()
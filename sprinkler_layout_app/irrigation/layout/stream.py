@@ -0,0 +1,57 @@
+"""
+Server-sent events for progressive layout generation.
+
+layout_events turns the generator's batches into an event stream: a `start`
+event with the area bounds and hydrozones, a `heads` event per batch, a
+`stage` event with timings as each pass (corners, edges, interior) of each
+zone finishes, and a final `done`. The corner pass takes milliseconds, so
+clients can start drawing heads long before the interior fill completes.
+
+The sketch is read inside the stream too, so the response starts at once;
+if it can't be read the stream is a single `error` event.
+"""
+import json
+import time
+
+from asgiref.sync import sync_to_async
+
+from irrigation.layout.generator import iter_hydrozone_layout
+from irrigation.layout.pool import hydrozone_bounds
+from irrigation.utils import sanitize_layout_data
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(sanitize_layout_data(data), separators=(',', ':'))}\n\n"
+
+
+def layout_events(load_hydrozones):
+    """Events for the hydrozones `load_hydrozones()` returns (see build_hydrozones)."""
+    started = time.perf_counter()
+    try:
+        hydrozones = load_hydrozones()
+    except Exception as e:
+        yield sse("error", {"error": f"Could not read the yard's sketch: {e}"})
+        return
+    yield sse("start", {
+        "area_bounds": hydrozone_bounds(hydrozones),
+        "zones": [{"id": i, "exposure": zone["exposure"], "sloped": zone["sloped"]} for i, zone in enumerate(hydrozones, 1)],
+    })
+    total = 0
+    for stage, heads, elapsed, done in iter_hydrozone_layout(hydrozones):
+        if heads:
+            total += len(heads)
+            yield sse("heads", {"stage": stage, "heads": heads})
+        if done:
+            yield sse("stage", {"stage": stage, "elapsed_ms": round(elapsed * 1000, 1), "total": total})
+    yield sse("done", {"total": total, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+
+async def aiter_events(events):
+    """
+    Steps a sync event iterator on a worker thread. ASGI servers buffer sync
+    iterators whole before sending, which would defeat the stream.
+    """
+    step = sync_to_async(next, thread_sensitive=False)
+    end = object()
+    while (event := await step(events, end)) is not end:
+        yield event
@@ -1,34 +1,184 @@
-from shapely.geometry import shape, Polygon
-from shapely.ops import unary_union
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from .geometry import GRID_SIZE, geometries_from_wkb, normalize_geometry
 from .models import SketchElement
 
-def parse_yard_geometry(yard):
+def load_element_geometries(sketch_elements):
     """
-    Parses sketch elements for a yard and returns plantable area (as polygons) 
-    with obstacles removed.
+    Reads element types and shapely geometries as parallel NumPy arrays (see
+    geometries_with_fallback). Empty geometries are dropped.
+    """
+    rows = list(sketch_elements.values_list('id', 'type', 'geometry_wkb'))
+    types = np.array([element_type for _, element_type, _ in rows], dtype=object)
+    geoms = geometries_with_fallback([element_id for element_id, _, _ in rows], [wkb for _, _, wkb in rows])
+
+    keep = ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms) if len(geoms) else np.zeros(0, dtype=bool)
+    return types[keep], geoms[keep]
+
+def geometries_with_fallback(ids, wkbs):
+    """
+    Decodes element WKB in one vectorized call. Rows saved before the binary
+    column existed fall back to their GeoJSON, read in one query.
+    """
+    geoms = geometries_from_wkb(wkbs)
+    missing = {element_id: i for i, (element_id, wkb) in enumerate(zip(ids, wkbs)) if wkb is None}
+    if missing:
+        fallback = SketchElement.objects.filter(id__in=missing).values_list('id', 'geometry')
+        for element_id, geojson in fallback:
+            if geojson:
+                geoms[missing[element_id]] = shape(geojson)
+    return geoms
+
+def dissolve(geoms):
+    """
+    Unions polygons into disjoint parts. An STRtree finds which polygons touch,
+    and only those clusters go through union_all; isolated polygons (most
+    obstacles and shade zones) pass straight through.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    if len(geoms) < 2:
+        return shapely.get_parts(geoms)
+    left, right = shapely.STRtree(geoms).query(geoms, predicate='intersects')
+    pairs = left < right
+    if not pairs.any():
+        return shapely.get_parts(geoms)
+
+    # Union-find over the touching pairs
+    parent = np.arange(len(geoms))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for a, b in zip(left[pairs], right[pairs]):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    roots = np.array([find(i) for i in range(len(geoms))])
+
+    parts = []
+    for root in np.unique(roots):
+        members = geoms[roots == root]
+        parts.append(members[0] if len(members) == 1 else shapely.union_all(members, grid_size=GRID_SIZE))
+    return shapely.get_parts(np.array(parts, dtype=object))
+
+def _polygonal(geoms):
+    """The Polygon/MultiPolygon members of `geoms`; lines and points cover no area."""
+    return geoms[np.isin(shapely.get_type_id(geoms), (3, 6))]
+
+def _overlay(parts, cutters, operation):
+    """
+    Applies `operation` (difference or intersection) between each part and the
+    dissolved, disjoint `cutters` it touches, found with an STRtree. Parts that
+    touch none come back unchanged from a difference and are dropped from an
+    intersection. Returns the non-empty polygonal pieces.
     """
-    sketch_elements = SketchElement.objects.filter(yard=yard)
+    if not len(parts) or not len(cutters):
+        return parts if operation is shapely.difference else parts[:0]
+    part_idx, cutter_idx = shapely.STRtree(cutters).query(parts, predicate='intersects')
+    result = parts.copy() if operation is shapely.difference else np.empty(len(parts), dtype=object)
+    for p in np.unique(part_idx):
+        # Dissolved cutters are disjoint, so a MultiPolygon of them is valid as-is
+        cut = shapely.multipolygons(cutters[cutter_idx[part_idx == p]])
+        result[p] = operation(parts[p], cut, grid_size=GRID_SIZE)
+    result = shapely.get_parts(result[~shapely.is_missing(result)])
+    return result[(shapely.get_type_id(result) == 3) & ~shapely.is_empty(result)]
 
-    plantable_polygons = []
-    obstacle_polygons = []
+def _combine(parts):
+    if not len(parts):
+        return shapely.GeometryCollection()
+    if len(parts) == 1:
+        return parts[0]
+    return shapely.multipolygons(parts)
 
-    for element in sketch_elements:
-        if not element.geometry:
-            continue  # skip empty geometry
+def build_usable_area(types, geoms):
+    """
+    Unions the plantable elements and subtracts obstacles. Elements are sorted
+    by type with NumPy masks, overlapping clusters are unioned on the 0.01 ft
+    sketch grid, and an STRtree pairs each plantable part with only the
+    obstacles that touch it.
+    """
+    types = np.asarray(types, dtype=object)
+    geoms = np.asarray(geoms, dtype=object)
+    parts = dissolve(_polygonal(geoms[np.isin(types, SketchElement.PLANTABLE_TYPES)]))
+    if not len(parts):
+        return shapely.GeometryCollection()
+    obstacles = dissolve(_polygonal(geoms[types == 'obstacle']))
+    return _combine(_overlay(parts, obstacles, shapely.difference))
+
+# Where exposure elements overlap, the shadier one wins: shade is drawn over lawn
+EXPOSURE_PRECEDENCE = ('full_shade', 'partial_shade', 'full_sun')
+
+def build_hydrozones(types, geoms):
+    """
+    Splits the usable area into hydrozones: one per exposure class, and within
+    each, sloped and flat ground apart. Each class is dissolved once, then
+    loses what shadier classes and obstacles cover, then is cut by the slope
+    regions; every step pairs parts only with the shapes an STRtree says they
+    touch, so the overlay stays near-linear in the number of elements.
+
+    Returns [{"exposure", "sloped", "geometry"}] for the non-empty zones, in
+    full_sun, partial_shade, full_shade order with flat before sloped.
+    """
+    types = np.asarray(types, dtype=object)
+    geoms = np.asarray(geoms, dtype=object)
+    obstacles = dissolve(_polygonal(geoms[types == 'obstacle']))
+    slopes = dissolve(_polygonal(geoms[types == 'slope']))
 
-        geom = shape(element.geometry)  # assumes GeoJSON-style dict
+    zones = []
+    shadier = np.empty(0, dtype=object)
+    for exposure in EXPOSURE_PRECEDENCE:
+        claimed = dissolve(_polygonal(geoms[types == exposure]))
+        parts = _overlay(_overlay(claimed, shadier, shapely.difference), obstacles, shapely.difference)
+        shadier = dissolve(np.concatenate([shadier, claimed]))
+        for sloped, operation in ((False, shapely.difference), (True, shapely.intersection)):
+            pieces = _overlay(parts, slopes, operation)
+            if len(pieces):
+                zones.append({"exposure": exposure, "sloped": sloped, "geometry": _combine(pieces)})
+    order = {exposure: i for i, exposure in enumerate(reversed(EXPOSURE_PRECEDENCE))}
+    return sorted(zones, key=lambda zone: (order[zone["exposure"]], zone["sloped"]))
 
-        if element.type in ['full_sun', 'partial_shade', 'full_shade']:
-            plantable_polygons.append(geom)
-        elif element.type == 'obstacle':
-            obstacle_polygons.append(geom)
+def parse_yard_geometry(yard, bounds=None):
+    """
+    Parses sketch elements for a yard and returns plantable area (as polygons) 
+    with obstacles removed. With `bounds`, only elements whose bounding box
+    overlaps that region are loaded.
+    """
+    sketch_elements = SketchElement.objects.filter(yard=yard).layout_inputs()
+    if bounds is not None:
+        sketch_elements = sketch_elements.intersecting(bounds)
+    return build_usable_area(*load_element_geometries(sketch_elements))
+
+def load_yard_elements(yard):
+    """(types, geometries) of the elements layout reads, for building both the usable area and hydrozones."""
+    return load_element_geometries(SketchElement.objects.filter(yard=yard).layout_inputs())
+
+def hydrozones_from_features(features, type_property='element_type'):
+    """
+    Hydrozones from GeoJSON Features, without a yard or the database. Each
+    feature's element type is read from properties[type_property], and types
+    the layout doesn't use are skipped. Geometries are normalized as on API
+    ingest, so the zones match a yard sketched with the same shapes. Raises
+    InvalidGeometry for an unusable geometry.
+    """
+    types, geoms = [], []
+    for feature in features:
+        element_type = (feature.get('properties') or {}).get(type_property)
+        if element_type not in SketchElement.LAYOUT_TYPES:
+            continue
+        geojson, _, _ = normalize_geometry(feature.get('geometry'), polygonal=element_type in SketchElement.PLANTABLE_TYPES)
+        types.append(element_type)
+        geoms.append(shape(geojson))
+    return build_hydrozones(types, geoms)
 
-    # Union all plantable zones into one polygon
-    usable_area = unary_union(plantable_polygons)
+def parse_yard_hydrozones(yard):
+    """Hydrozones (see build_hydrozones) of a yard's sketch."""
+    return build_hydrozones(*load_yard_elements(yard))
 
-    # Remove obstacles from usable area
-    if obstacle_polygons:
-        obstacles_union = unary_union(obstacle_polygons)
-        usable_area = usable_area.difference(obstacles_union)
+def parse_yard_obstacles(yard):
+    """Returns the obstacle shapes drawn for a yard."""
+    elements = SketchElement.objects.filter(yard=yard, type='obstacle')
+    _, geoms = load_element_geometries(elements)
+    return list(geoms)
 
-    return usable_area
\ No newline at end of file
@@ -0,0 +1,73 @@
+import datetime
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+# Worker entry points. Spawned workers import this module before Django is
+# set up, so it must not import models at the top level.
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _schedule_chunk(project_ids, week_start):
+    from irrigation.scheduling import schedule_projects
+    return schedule_projects(project_ids, week_start)
+
+
+class Command(BaseCommand):
+    help = "Recompute weekly zone schedules for every project from the configured weather source."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--week-start', help="First day of the week (YYYY-MM-DD); defaults to today.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Projects per batch.")
+        parser.add_argument(
+            '--workers', type=int, default=min(4, os.cpu_count() or 1),
+            help="Worker processes; 0 computes in this process.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            week_start = datetime.date.fromisoformat(options['week_start']) if options['week_start'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--week-start must be YYYY-MM-DD")
+        chunk_size, workers = options['chunk_size'], options['workers']
+        if chunk_size < 1 or workers < 0:
+            raise CommandError("--chunk-size must be positive and --workers non-negative")
+
+        from irrigation.scheduling import project_id_chunks
+
+        started = time.monotonic()
+        chunks = project_id_chunks(chunk_size)
+        if workers == 0:
+            zones = sum(_schedule_chunk(chunk, week_start) for chunk in chunks)
+        else:
+            zones = self.run_pool(chunks, week_start, workers)
+        self.stdout.write(self.style.SUCCESS(
+            f"Scheduled {zones} zones for the week of {week_start} in {time.monotonic() - started:.1f}s"
+        ))
+
+    def run_pool(self, chunks, week_start, workers):
+        """
+        Fans chunks out to worker processes, each with its own database
+        connection. At most two chunks per worker are in flight, so memory
+        stays flat however many projects there are.
+        """
+        zones = 0
+        pending = set()
+        # spawn, not fork: a forked worker would inherit the database connection
+        # project_id_chunks keeps querying on here, and both would talk over one socket
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            for chunk in chunks:
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    zones += sum(future.result() for future in done)
+                pending.add(pool.submit(_schedule_chunk, chunk, week_start))
+            zones += sum(future.result() for future in wait(pending).done)
+        return zones
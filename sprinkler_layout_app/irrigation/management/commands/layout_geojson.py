@@ -0,0 +1,142 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+GEOJSON_SUFFIXES = ('.geojson', '.json')
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl', '.geojsonl')
+
+
+# Worker entry points. Spawned workers import this module before Django is
+# set up, so it must not import models at the top level.
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _layout_batch(batch, type_property):
+    """
+    (NDJSON lines, failures) for a batch of (source, JSON text) yards. A
+    record that isn't a JSON object or can't be laid out gets a line with
+    an error instead.
+    """
+    from irrigation.layout.pool import layout_payload_for_zones
+    from irrigation.layout_utils import hydrozones_from_features
+
+    lines, failed = [], 0
+    for source, text in batch:
+        result = {'source': source}
+        try:
+            collection = json.loads(text)
+            if not isinstance(collection, dict):
+                raise ValueError(f"expected a FeatureCollection object, got {type(collection).__name__}")
+            result = {'id': collection.get('id', source), 'source': source}
+            zones = hydrozones_from_features(collection.get('features') or [], type_property)
+            result.update(layout_payload_for_zones(zones))
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+            failed += 1
+        lines.append(json.dumps(result, separators=(',', ':')))
+    return lines, failed
+
+
+def read_collections(paths):
+    """
+    Yields (source, JSON text) from .geojson/.json files holding one
+    collection and .ndjson/.jsonl/.geojsonl files holding one per line.
+    Directories are searched recursively. Files are read one at a time.
+    Records are parsed by _layout_batch, so a malformed one fails alone.
+    """
+    for path in map(Path, paths):
+        if path.is_dir():
+            files = sorted(p for p in path.rglob('*') if p.suffix.lower() in GEOJSON_SUFFIXES + NDJSON_SUFFIXES)
+        else:
+            files = [path]
+        for file in files:
+            if file.suffix.lower() in NDJSON_SUFFIXES:
+                with open(file) as f:
+                    for number, line in enumerate(f, 1):
+                        if line.strip():
+                            yield f"{file}:{number}", line
+            else:
+                with open(file) as f:
+                    yield str(file), f.read()
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Lay out yards from GeoJSON FeatureCollections on disk, without the database, "
+        "writing one JSON result per yard (NDJSON)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="GeoJSON/NDJSON files or directories of them.")
+        parser.add_argument('--output', '-o', default='-', help="NDJSON output file; '-' for stdout.")
+        parser.add_argument(
+            '--workers', type=int, default=min(4, os.cpu_count() or 1),
+            help="Worker processes; 0 lays out in this process.",
+        )
+        parser.add_argument('--batch-size', type=int, default=20, help="Yards per worker task.")
+        parser.add_argument(
+            '--type-property', default='element_type',
+            help="Feature property holding the sketch element type (full_sun, obstacle, slope, ...).",
+        )
+
+    def handle(self, *args, **options):
+        workers, batch_size = options['workers'], options['batch_size']
+        if batch_size < 1 or workers < 0:
+            raise CommandError("--batch-size must be positive and --workers non-negative")
+        for path in options['paths']:
+            if not Path(path).exists():
+                raise CommandError(f"No such file or directory: {path}")
+
+        started = time.monotonic()
+        chunks = batches(read_collections(options['paths']), batch_size)
+        out = self.stdout if options['output'] == '-' else open(options['output'], 'w')
+        try:
+            if workers == 0:
+                results = (_layout_batch(chunk, options['type_property']) for chunk in chunks)
+            else:
+                results = self.run_pool(chunks, options['type_property'], workers)
+            yards = failed = 0
+            for lines, batch_failed in results:
+                out.write(''.join(line + '\n' for line in lines))
+                yards += len(lines)
+                failed += batch_failed
+        finally:
+            if out is not self.stdout:
+                out.close()
+        self.stderr.write(f"Laid out {yards} yards ({failed} failed) in {time.monotonic() - started:.1f}s")
+
+    def run_pool(self, chunks, type_property, workers):
+        """
+        Yields batch results as workers finish them, so output order follows
+        completion order (each line carries its source). At most two batches
+        per worker are in flight, so input is read no faster than it's used.
+        """
+        pending = set()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            for chunk in chunks:
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(pool.submit(_layout_batch, chunk, type_property))
+            for future in wait(pending).done:
+                yield future.result()
@@ -0,0 +1,90 @@
+import copy
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+from irrigation.models import Yard
+
+
+class Command(BaseCommand):
+    help = (
+        "Time request-shaped database work with a new connection per request and with the "
+        "configured reuse (CONN_MAX_AGE or pool), against the default database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Simulated requests per mode.")
+        parser.add_argument('--threads', type=int, default=1, help="Concurrent request threads, each with its own connection.")
+
+    def handle(self, *args, **options):
+        requests, threads = options['requests'], options['threads']
+        if requests < 1 or threads < 1:
+            raise CommandError("--requests and --threads must be positive")
+
+        base = connections.settings['default']
+        per_request = {**copy.deepcopy(base), 'CONN_MAX_AGE': 0}
+        per_request['OPTIONS'].pop('pool', None)
+        modes = [('per-request', per_request), ('configured', copy.deepcopy(base))]
+
+        self.stdout.write(f"{base['ENGINE']}  CONN_MAX_AGE={base['CONN_MAX_AGE']}  pool={'pool' in base['OPTIONS']}")
+        self.stdout.write(f"{'mode':<12} {'requests':>8} {'connects':>8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, settings_dict in modes:
+            latencies, connects = self.run_mode(f'loadtest-{name}', settings_dict, requests, threads)
+            cuts = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else latencies * 19
+            self.stdout.write(
+                f"{name:<12} {len(latencies):>8} {connects:>8} {statistics.fmean(latencies):>8.2f} "
+                f"{statistics.median(latencies):>8.2f} {cuts[18]:>8.2f}"
+            )
+
+    def run_mode(self, alias, settings_dict, requests, threads):
+        connects = 0
+
+        def count(sender, connection, **kwargs):
+            nonlocal connects
+            if connection.alias == alias:
+                connects += 1
+
+        connection_created.connect(count)
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                shares = [requests // threads + (i < requests % threads) for i in range(threads)]
+                results = executor.map(lambda n: self.worker(alias, settings_dict, n), shares)
+                latencies = [ms for result in results for ms in result]
+        finally:
+            connection_created.disconnect(count)
+        return latencies, connects
+
+    def worker(self, alias, settings_dict, requests):
+        """
+        Runs `requests` request cycles on one connection wrapper, doing what the
+        request_started/request_finished handlers do around each: close the
+        connection if it is past CONN_MAX_AGE (or, with a pool, return it).
+        """
+        connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+        quote = connection.ops.quote_name
+        user_sql = f"SELECT id, password, is_active FROM {quote(get_user_model()._meta.db_table)} WHERE id = %s"
+        yard_sql = f"SELECT id, revision FROM {quote(Yard._meta.db_table)} ORDER BY id DESC LIMIT 20"
+
+        latencies = []
+        try:
+            for i in range(requests):
+                started = time.perf_counter()
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute(user_sql, [i + 1])
+                    cursor.fetchone()
+                    cursor.execute(yard_sql)
+                    cursor.fetchall()
+                latencies.append((time.perf_counter() - started) * 1000)
+                connection.close_if_unusable_or_obsolete()
+        finally:
+            connection.close()
+            if hasattr(connection, 'close_pool'):
+                connection.close_pool()
+        return latencies
@@ -0,0 +1,40 @@
+import time
+
+from django.core.mail import get_connection
+from django.db import close_old_connections
+from django.core.management.base import BaseCommand
+
+from irrigation.outbox import MAX_ATTEMPTS, send_due_batch
+
+
+class Command(BaseCommand):
+    help = "Send queued outbound email in batches over a single mail connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new mail instead of exiting once the queue is drained.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_due_batch(connection, options['batch_size'], options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                if sent + failed:
+                    continue
+                # Queue drained: don't hold the SMTP session open while idle
+                connection.close()
+                if not options['loop']:
+                    break
+                # No request signals here, so recycle the database connection by hand
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        self.stdout.write(f"Sent {total_sent} emails, {total_failed} failed attempts")
@@ -0,0 +1,245 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+MAX_SIGNATURES_PER_ENDPOINT = 20
+
+_IN_LIST_RE = re.compile(r"IN \((?:%s(?:, )?)+\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_profiler_lock = threading.Lock()  # held while a request runs under cProfile
+
+
+def profiling_settings():
+    defaults = {
+        'ENABLED': False,
+        'PROFILE_SAMPLE_RATE': 0.0,
+        'PROFILE_THRESHOLD_MS': 500,
+        'PROFILE_DIR': None,
+        'PROFILE_MAX_FILES': 50,
+    }
+    defaults.update(getattr(settings, 'IRRIGATION_PROFILING', {}))
+    return defaults
+
+
+def sql_signature(sql):
+    """Collapses literals and IN-lists so repeated queries share one signature."""
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    sql = _LITERAL_RE.sub("?", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_queries = 0
+        self.max_queries = 0
+        self.duplicate_signatures = Counter()  # signature -> requests where it repeated
+        self.max_repeats = Counter()  # signature -> worst repeat count in one request
+
+    def record(self, elapsed_ms, query_count, duplicates):
+        self.requests += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.histogram[_bucket_index(elapsed_ms)] += 1
+        self.total_queries += query_count
+        self.max_queries = max(self.max_queries, query_count)
+        for signature, repeats in duplicates.items():
+            self.duplicate_signatures[signature] += 1
+            self.max_repeats[signature] = max(self.max_repeats[signature], repeats)
+
+    def as_dict(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "requests": self.requests,
+            "avg_ms": round(self.total_ms / self.requests, 3) if self.requests else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram": dict(zip(labels, self.histogram)),
+            "avg_queries": round(self.total_queries / self.requests, 2) if self.requests else 0.0,
+            "max_queries": self.max_queries,
+            "duplicate_queries": [
+                {"signature": sig, "requests": count, "max_repeats": self.max_repeats[sig]}
+                for sig, count in self.duplicate_signatures.most_common(MAX_SIGNATURES_PER_ENDPOINT)
+            ],
+        }
+
+
+def _bucket_index(elapsed_ms):
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+
+class ProfilingRegistry:
+    """Process-wide aggregates keyed on "METHOD view-name"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, elapsed_ms, query_count, duplicates):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.record(elapsed_ms, query_count, duplicates)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+registry = ProfilingRegistry()
+
+
+class QueryCollector:
+    """Database execute wrapper that counts queries by signature."""
+
+    def __init__(self):
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.signatures[sql_signature(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.signatures.values())
+
+    def duplicates(self):
+        return {sig: n for sig, n in self.signatures.items() if n > 1}
+
+
+class ProfileStore:
+    """Rotating on-disk store of cProfile dumps for slow requests."""
+
+    def __init__(self, directory, max_files):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, profiler, endpoint, elapsed_ms):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", endpoint).strip("_")
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(elapsed_ms)}ms-{slug}-{os.getpid()}.prof"
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(self.directory / filename)
+            self._rotate()
+
+    def _rotate(self):
+        dumps = sorted(self.directory.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+        for stale in dumps[:max(0, len(dumps) - self.max_files)]:
+            stale.unlink(missing_ok=True)
+
+    def list(self):
+        if not self.directory.exists():
+            return []
+        return sorted((p.name for p in self.directory.glob("*.prof")), reverse=True)
+
+
+def profile_store():
+    config = profiling_settings()
+    if not config['PROFILE_DIR']:
+        return None
+    return ProfileStore(config['PROFILE_DIR'], config['PROFILE_MAX_FILES'])
+
+
+class QueryProfilingMiddleware:
+    """
+    Records per-endpoint latency histograms, query counts and duplicated query
+    signatures (N+1 patterns). A random sample of requests is run under
+    cProfile and the dump is kept when the request exceeds the threshold.
+
+    Only one profiler can be active in a process at a time, so a sampled
+    request that arrives while another is being profiled just isn't
+    profiled. Under ASGI a profile also picks up whatever other requests
+    the event loop runs meanwhile.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = profiling_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_rate = config['PROFILE_SAMPLE_RATE']
+        self.threshold_ms = config['PROFILE_THRESHOLD_MS']
+        self.store = profile_store()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with self._measure(request):
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        with self._measure(request):
+            response = await self.get_response(request)
+        return response
+
+    def _claim_profiler(self):
+        if not (self.store and self.sample_rate and random.random() < self.sample_rate):
+            return None
+        if not _profiler_lock.acquire(blocking=False):
+            return None
+        return cProfile.Profile()
+
+    @contextmanager
+    def _measure(self, request):
+        """Collects the queries (and maybe a profile) of the request handled inside the block."""
+        collector = QueryCollector()
+        profiler = self._claim_profiler()
+        try:
+            start = time.perf_counter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(collector))
+                if profiler:
+                    profiler.enable()
+                try:
+                    yield
+                finally:
+                    if profiler:
+                        profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            endpoint = self.endpoint_name(request)
+            registry.record(endpoint, elapsed_ms, collector.count, collector.duplicates())
+            if profiler and elapsed_ms >= self.threshold_ms:
+                self.store.save(profiler, endpoint, elapsed_ms)
+        finally:
+            if profiler:
+                _profiler_lock.release()
+
+    @staticmethod
+    def endpoint_name(request):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        return f"{request.method} {view}"
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0003_alter_sketchelement_type_alter_sprinklerhead_zone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yard',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Bumped whenever the yard's sketch changes"),
+        ),
+    ]
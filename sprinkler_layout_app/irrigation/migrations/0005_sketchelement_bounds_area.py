@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0004_yard_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sketchelement',
+            name='area',
+            field=models.FloatField(blank=True, editable=False, help_text='Square feet', null=True),
+        ),
+        migrations.AddField(
+            model_name='sketchelement',
+            name='maxx',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sketchelement',
+            name='maxy',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sketchelement',
+            name='minx',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sketchelement',
+            name='miny',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:10
+
+from django.db import migrations, models
+from shapely.errors import GEOSException, GeometryTypeError
+from shapely.geometry import shape
+
+
+def _read(geojson):
+    # Frozen copy of irrigation.geometry._read, so later edits there leave this migration alone
+    if not geojson:
+        return None
+    try:
+        geom = shape(geojson)
+    except (GEOSException, GeometryTypeError, AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+    return None if geom.is_empty else geom
+
+
+def backfill_bounds(apps, schema_editor):
+    SketchElement = apps.get_model('irrigation', 'SketchElement')
+    batch = []
+    for element in SketchElement.objects.filter(minx__isnull=True).iterator(chunk_size=500):
+        geom = _read(element.geometry)
+        if geom is not None:
+            element.minx, element.miny, element.maxx, element.maxy = geom.bounds
+            element.area = geom.area
+        batch.append(element)
+        if len(batch) >= 500:
+            SketchElement.objects.bulk_update(batch, ['minx', 'miny', 'maxx', 'maxy', 'area'])
+            batch = []
+    if batch:
+        SketchElement.objects.bulk_update(batch, ['minx', 'miny', 'maxx', 'maxy', 'area'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0005_sketchelement_bounds_area'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sketchelement',
+            index=models.Index(fields=['yard', 'type'], name='sketch_yard_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sketchelement',
+            index=models.Index(fields=['yard', 'minx', 'maxx', 'miny', 'maxy'], name='sketch_yard_bbox_idx'),
+        ),
+        migrations.RunPython(backfill_bounds, migrations.RunPython.noop),
+    ]
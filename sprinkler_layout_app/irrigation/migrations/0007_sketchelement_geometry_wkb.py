@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:11
+
+import shapely
+from django.db import migrations, models
+from shapely.errors import GEOSException, GeometryTypeError
+from shapely.geometry import shape
+
+
+def _read(geojson):
+    # Frozen copy of irrigation.geometry._read, so later edits there leave this migration alone
+    if not geojson:
+        return None
+    try:
+        geom = shape(geojson)
+    except (GEOSException, GeometryTypeError, AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+    return None if geom.is_empty else geom
+
+
+def backfill_wkb(apps, schema_editor):
+    SketchElement = apps.get_model('irrigation', 'SketchElement')
+    batch = []
+    for element in SketchElement.objects.filter(geometry_wkb__isnull=True).iterator(chunk_size=500):
+        geom = _read(element.geometry)
+        element.geometry_wkb = shapely.to_wkb(geom) if geom is not None else None
+        batch.append(element)
+        if len(batch) >= 500:
+            SketchElement.objects.bulk_update(batch, ['geometry_wkb'])
+            batch = []
+    if batch:
+        SketchElement.objects.bulk_update(batch, ['geometry_wkb'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0006_sketchelement_bbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sketchelement',
+            name='geometry_wkb',
+            field=models.BinaryField(blank=True, help_text='Binary copy of geometry for bulk layout reads', null=True),
+        ),
+        migrations.RunPython(backfill_wkb, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0007_sketchelement_geometry_wkb'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yard',
+            name='sketch_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Current position in the sketch revision log'),
+        ),
+        migrations.CreateModel(
+            name='SketchRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('deltas', models.JSONField(default=list)),
+                ('snapshot', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('yard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sketch_revisions', to='irrigation.yard')),
+            ],
+            options={
+                'ordering': ['yard', 'sequence'],
+                'constraints': [models.UniqueConstraint(fields=('yard', 'sequence'), name='unique_sketch_revision_per_yard')],
+            },
+        ),
+    ]
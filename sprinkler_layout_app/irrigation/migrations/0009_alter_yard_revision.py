@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0008_sketch_revisions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='yard',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bumped whenever the yard or its sketch, zones or heads change'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0009_alter_yard_revision'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='project_user_updated_idx'),
+        ),
+    ]
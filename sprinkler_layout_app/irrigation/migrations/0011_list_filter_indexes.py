@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0010_project_dashboard_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sketchelement',
+            index=models.Index(fields=['yard', '-id'], name='sketch_yard_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sprinklerhead',
+            index=models.Index(fields=['zone', '-id'], name='head_zone_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['yard', '-id'], name='zone_yard_id_idx'),
+        ),
+    ]
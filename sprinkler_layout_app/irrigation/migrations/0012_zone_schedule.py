@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0011_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('weekly_minutes', models.FloatField(blank=True, null=True)),
+                ('days_per_week', models.IntegerField(blank=True, null=True)),
+                ('runtime_minutes', models.FloatField(blank=True, help_text='Per watering day', null=True)),
+                ('cycles', models.IntegerField(blank=True, null=True)),
+                ('cycle_minutes', models.FloatField(blank=True, null=True)),
+                ('et_inches', models.FloatField(help_text='Crop water use over the week')),
+                ('rain_inches', models.FloatField(default=0.0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('zone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='irrigation.zone')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0012_zone_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zone',
+            name='valve_location',
+            field=models.JSONField(blank=True, help_text='Coordinates like {x: 0, y: 0}', null=True),
+        ),
+    ]
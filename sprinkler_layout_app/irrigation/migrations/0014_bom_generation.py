@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('irrigation', '0013_zone_valve_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billofmaterials',
+            name='estimated_cost',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='billofmaterials',
+            name='generated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='billofmaterials',
+            name='yard_revision',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Yard revision the items were generated from', null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes token_blacklist's OutstandingToken.expires_at, which purge_tokens
+    filters on. The model belongs to simplejwt, so the index is added here.
+    """
+
+    dependencies = [
+        ('irrigation', '0015_outbound_email'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS token_outstanding_expires_idx ON token_blacklist_outstandingtoken (expires_at)",
+            reverse_sql="DROP INDEX IF EXISTS token_outstanding_expires_idx",
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -17,6 +18,12 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Serves the dashboard's cursor pagination
+            models.Index(fields=['user', '-updated_at', '-id'], name='project_user_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Project {self.name}"
 
@@ -28,10 +35,37 @@ class Yard(models.Model):
     zip_code = models.CharField(max_length=10)
     water_pressure = models.FloatField(help_text="PSI")
     flow_rate = models.FloatField(help_text="GPM")
+    revision = models.PositiveIntegerField(default=0, editable=False, help_text="Bumped whenever the yard or its sketch, zones or heads change")
+    sketch_sequence = models.PositiveIntegerField(default=0, editable=False, help_text="Current position in the sketch revision log")
+
+    # Only ever changed with atomic UPDATEs, so a stale instance must not write them back
+    COUNTER_FIELDS = ('revision', 'sketch_sequence')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Yard for {self.project}"
 
+    @classmethod
+    def bump_revision(cls, yard_id):
+        cls.objects.filter(pk=yard_id).update(revision=models.F('revision') + 1)
+
+class SketchElementQuerySet(models.QuerySet):
+    def intersecting(self, bounds):
+        """Elements whose bounding box overlaps `bounds`; served by the bbox index."""
+        minx, miny, maxx, maxy = bounds
+        return self.filter(minx__lte=maxx, maxx__gte=minx, miny__lte=maxy, maxy__gte=miny)
+
+    def layout_inputs(self):
+        """Only the element types the layout generator reads (no labels)."""
+        return self.filter(type__in=SketchElement.LAYOUT_TYPES)
+
 class SketchElement(models.Model):
     YARD_ELEMENT_TYPES = [
     ("obstacle", "Obstacle"),
@@ -41,25 +75,84 @@ class SketchElement(models.Model):
     ("full_shade", "Full Shade"),
     ("label", "Label"),  
     ]
+    PLANTABLE_TYPES = ("full_sun", "partial_shade", "full_shade")
+    LAYOUT_TYPES = PLANTABLE_TYPES + ("obstacle", "slope")
+    DERIVED_FIELDS = ('minx', 'miny', 'maxx', 'maxy', 'area', 'geometry_wkb')
     
     yard = models.ForeignKey('Yard', on_delete=models.CASCADE, related_name='sketch_elements')
     type = models.CharField(max_length=50, choices=YARD_ELEMENT_TYPES)
     geometry = models.JSONField(help_text="Geometry: point, polyline, or polygon as JSON")
     properties = models.JSONField(default=dict, help_text="Extra properties like color, label, rotation")
 
+    # Precomputed from the normalized geometry on ingest
+    minx = models.FloatField(null=True, blank=True, editable=False)
+    miny = models.FloatField(null=True, blank=True, editable=False)
+    maxx = models.FloatField(null=True, blank=True, editable=False)
+    maxy = models.FloatField(null=True, blank=True, editable=False)
+    area = models.FloatField(null=True, blank=True, editable=False, help_text="Square feet")
+    geometry_wkb = models.BinaryField(null=True, blank=True, editable=False, help_text="Binary copy of geometry for bulk layout reads")
+
+    objects = SketchElementQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['yard', 'type'], name='sketch_yard_type_idx'),
+            models.Index(fields=['yard', 'minx', 'maxx', 'miny', 'maxy'], name='sketch_yard_bbox_idx'),
+            # Serves ?yard= filtered list pages in cursor (-id) order
+            models.Index(fields=['yard', '-id'], name='sketch_yard_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'geometry' in update_fields:
+            self.update_derived_fields()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.DERIVED_FIELDS)
+        super().save(*args, **kwargs)
+
+    def update_derived_fields(self):
+        from .geometry import derived_geometry_fields  # shapely loads on the first geometry write
+        for field, value in derived_geometry_fields(self.geometry).items():
+            setattr(self, field, value)
+
     def __str__(self):
         return f"Sketch element for {self.yard}"
 
+class SketchRevision(models.Model):
+    """
+    One autosave in a yard's append-only sketch history. `deltas` holds the
+    element changes with enough "before" state to undo them; every
+    SNAPSHOT_INTERVAL revisions also store the full sketch in `snapshot`.
+    """
+    yard = models.ForeignKey(Yard, on_delete=models.CASCADE, related_name='sketch_revisions')
+    sequence = models.PositiveIntegerField()
+    deltas = models.JSONField(default=list)
+    snapshot = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['yard', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['yard', 'sequence'], name='unique_sketch_revision_per_yard')
+        ]
+
+    def __str__(self):
+        return f"Sketch revision {self.sequence} for {self.yard}"
+
 class Zone(models.Model):
     yard = models.ForeignKey(Yard, on_delete=models.CASCADE, related_name='zones')
     zone_number = models.IntegerField(null=True, blank=True)
     total_flow = models.FloatField(null=True, blank=True)
     area_covered = models.FloatField(null=True, blank=True)
+    valve_location = models.JSONField(null=True, blank=True, help_text="Coordinates like {x: 0, y: 0}")
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['yard', 'zone_number'], name='unique_zone_number_per_yard')
         ]
+        indexes = [
+            models.Index(fields=['yard', '-id'], name='zone_yard_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.zone_number is None:
@@ -75,6 +168,22 @@ class Zone(models.Model):
     def __str__(self):
         return f"Zone {self.zone_number} for {self.yard}"
 
+class ZoneSchedule(models.Model):
+    """Weekly watering schedule for a zone, recomputed by `manage.py compute_schedules`."""
+    zone = models.OneToOneField(Zone, on_delete=models.CASCADE, related_name='schedule')
+    week_start = models.DateField()
+    weekly_minutes = models.FloatField(null=True, blank=True)
+    days_per_week = models.IntegerField(null=True, blank=True)
+    runtime_minutes = models.FloatField(null=True, blank=True, help_text="Per watering day")
+    cycles = models.IntegerField(null=True, blank=True)
+    cycle_minutes = models.FloatField(null=True, blank=True)
+    et_inches = models.FloatField(help_text="Crop water use over the week")
+    rain_inches = models.FloatField(default=0.0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Schedule for {self.zone} (week of {self.week_start})"
+
 class SprinklerHead(models.Model):
     zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='sprinkler_heads', null=True, blank=True)
     head_number = models.IntegerField(null=True, blank=True, help_text="Sequential number within the zone")
@@ -90,6 +199,9 @@ class SprinklerHead(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['zone', 'head_number'], name='unique_head_number_per_zone')
         ]
+        indexes = [
+            models.Index(fields=['zone', '-id'], name='head_zone_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.head_number is None:
@@ -108,6 +220,37 @@ class SprinklerHead(models.Model):
 class BillOfMaterials(models.Model):
     project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='bom')
     items = models.JSONField(default=list)  # [{ "type": "Rotary Head", "quantity": 4 }, ...]
+    estimated_cost = models.FloatField(null=True, blank=True)
+    yard_revision = models.PositiveIntegerField(null=True, blank=True, editable=False, help_text="Yard revision the items were generated from")
+    generated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return f"BOM for {self.project}"
+
+class OutboundEmail(models.Model):
+    """Outbox row written with the change that triggers the mail; sent by `manage.py send_queued_email`."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True, help_text="Blank uses DEFAULT_FROM_EMAIL")
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The sender polls for due pending rows in this order
+            models.Index(fields=['status', 'next_attempt_at', 'id'], name='outbox_due_idx'),
+        ]
 
     def __str__(self):
-        return f"BOM for {self.project}"
\ No newline at end of file
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,85 @@
+"""
+Transactional email outbox.
+
+Views call enqueue_email inside the transaction that writes the data the
+message is about, so a mail is queued exactly when that write commits and
+the request never waits on SMTP. `manage.py send_queued_email` drains the
+queue in batches over one connection, retrying failures with exponential
+backoff until MAX_ATTEMPTS.
+"""
+from datetime import timedelta
+
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60  # seconds; doubles with each failed attempt
+RETRY_MAX_DELAY = 60 * 60
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None):
+    """Queues a message with the same arguments as django.core.mail.send_mail."""
+    return OutboundEmail.objects.create(
+        subject=subject, body=message, from_email=from_email or '', to=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def _failed(email, error, now, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def send_due_batch(connection, batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Sends up to `batch_size` due messages over `connection` and records the
+    outcome of each with one bulk update. Rows are locked (skipping rows
+    another sender holds) until the batch is recorded, so concurrent senders
+    never send the same message twice. Returns (sent, failed).
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        batch = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        sent = failed = 0
+        try:
+            connection.open()
+        except Exception as e:
+            for email in batch:
+                _failed(email, e, now, max_attempts)
+            failed = len(batch)
+        else:
+            for email in batch:
+                message = EmailMessage(
+                    email.subject, email.body, email.from_email or None, email.to, connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    _failed(email, e, now, max_attempts)
+                    failed += 1
+                else:
+                    email.status = 'sent'
+                    email.attempts += 1
+                    email.sent_at = timezone.now()
+                    sent += 1
+
+        OutboundEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+        return sent, failed
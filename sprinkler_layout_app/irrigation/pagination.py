@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Default list pagination. Cursors seek on the primary key, so every page
+    costs the same however deep the client has scrolled.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-id'
+
+
+class DashboardCursorPagination(DefaultCursorPagination):
+    page_size = 25
+    max_page_size = 100
+    ordering = ('-updated_at', '-id')
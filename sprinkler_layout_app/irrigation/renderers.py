@@ -0,0 +1,31 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class BinaryImageRenderer(BaseRenderer):
+    """Passes rendered image bytes through; anything else (errors) is sent as JSON."""
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return JSONRenderer().render(data)
+
+
+class PNGRenderer(BinaryImageRenderer):
+    media_type = 'image/png'
+    format = 'png'
+
+
+class SVGRenderer(BinaryImageRenderer):
+    media_type = 'image/svg+xml'
+    format = 'svg'
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets views answer EventSource clients; errors become a single `error` event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b"event: error\ndata: " + JSONRenderer().render(data) + b"\n\n"
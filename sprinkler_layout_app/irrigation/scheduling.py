@@ -0,0 +1,85 @@
+"""
+Weekly zone schedules from weather and each yard's soil and turf.
+
+The week's crop water use (reference ET x crop coefficient) less effective
+rainfall is the net depth to apply. It is split into as many watering days
+as the root zone needs to avoid drying past its allowed depletion, and each
+day's runtime into cycle-soak cycles the soil can absorb.
+"""
+import math
+
+import numpy as np
+
+from .models import Project, Zone, ZoneSchedule
+from .water_budget import APPLICATION_EFFICIENCY, allowable_depletion, zone_inputs
+from .weather import weather_source
+
+EFFECTIVE_RAINFALL = 0.8  # share of rain that reaches the root zone
+SCHEDULE_FIELDS = (
+    'week_start', 'weekly_minutes', 'days_per_week', 'runtime_minutes',
+    'cycles', 'cycle_minutes', 'et_inches', 'rain_inches', 'computed_at',
+)
+
+
+def weekly_schedule(site, pr, et0, rain):
+    et_inches = float(np.sum(et0)) * site.turf.kc
+    rain_inches = float(np.sum(rain))
+    schedule = {'et_inches': round(et_inches, 3), 'rain_inches': round(rain_inches, 3)}
+    if pr is None:
+        return schedule
+
+    net = max(0.0, et_inches - EFFECTIVE_RAINFALL * rain_inches)
+    if net == 0:
+        schedule.update(weekly_minutes=0.0, days_per_week=0, runtime_minutes=0.0, cycles=0, cycle_minutes=0.0)
+        return schedule
+
+    weekly_minutes = net / APPLICATION_EFFICIENCY / pr * 60
+    days = min(7, max(1, math.ceil(net / allowable_depletion(site))))
+    runtime = weekly_minutes / days
+    cycles = max(1, math.ceil(pr / site.soil.intake_rate))
+    schedule.update(
+        weekly_minutes=round(weekly_minutes, 1),
+        days_per_week=days,
+        runtime_minutes=round(runtime, 1),
+        cycles=cycles,
+        cycle_minutes=round(runtime / cycles, 1),
+    )
+    return schedule
+
+
+def schedule_projects(project_ids, week_start):
+    """
+    Computes and upserts the schedules of every zone in `project_ids` with one
+    bulk write. Weather is fetched once per zip code. Returns the zone count.
+    """
+    source = weather_source()
+    weather = {}
+    schedules = []
+    zones = Zone.objects.filter(yard__project_id__in=project_ids)
+    for zone_id, zip_code, site, pr in zone_inputs(zones):
+        if zip_code not in weather:
+            weather[zip_code] = source.week(zip_code, week_start)
+        schedules.append(ZoneSchedule(
+            zone_id=zone_id, week_start=week_start, **weekly_schedule(site, pr, *weather[zip_code])
+        ))
+    ZoneSchedule.objects.bulk_create(
+        schedules, update_conflicts=True, unique_fields=['zone'], update_fields=SCHEDULE_FIELDS
+    )
+    return len(schedules)
+
+
+def project_id_chunks(chunk_size):
+    """
+    Streams project ids in primary-key order, `chunk_size` at a time. Each
+    chunk is its own keyset query rather than one long-lived cursor, so no
+    read stays open while the workers write.
+    """
+    last = 0
+    while True:
+        chunk = list(
+            Project.objects.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
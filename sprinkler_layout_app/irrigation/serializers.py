@@ -1,8 +1,19 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import serializers
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from .models import Project, Yard, SprinklerHead, Zone, BillOfMaterials, SketchElement
+from .auth import BlacklistFilteredRefreshToken
+
+class SparseFieldsMixin:
+    """Accepts a `fields` kwarg that limits output to the named fields."""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
@@ -30,13 +41,18 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     new_password = serializers.CharField(write_only=True)
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = BlacklistFilteredRefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs)
         if not self.user.is_active:
             raise serializers.ValidationError("Email not verified. Please check your email.")
         return data
     
-class ProjectSerializer(serializers.ModelSerializer):
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = BlacklistFilteredRefreshToken
+
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = '__all__'
@@ -46,17 +62,51 @@ class ProjectSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         return Project.objects.create(user=user, **validated_data)
 
-class SketchElementSerializer(serializers.ModelSerializer):
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    yard_id = serializers.IntegerField(read_only=True)
+    zone_count = serializers.IntegerField(read_only=True)
+    head_count = serializers.IntegerField(read_only=True)
+    total_gpm = serializers.FloatField(read_only=True)
+    last_sketch_save = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Project
+        fields = [
+            'id', 'name', 'status', 'created_at', 'updated_at',
+            'yard_id', 'zone_count', 'head_count', 'total_gpm', 'last_sketch_save',
+        ]
+
+class SketchElementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SketchElement
-        fields = '__all__'
+        exclude = ['geometry_wkb']
         read_only_fields = ['yard']
 
+    def validate(self, attrs):
+        # Normalize geometry once on ingest so layout never has to repair it
+        if 'geometry' in attrs:
+            from .geometry import normalize_geometry, InvalidGeometry
+            element_type = attrs.get('type', getattr(self.instance, 'type', None))
+            try:
+                attrs['geometry'], _, _ = normalize_geometry(
+                    attrs['geometry'], polygonal=element_type in SketchElement.PLANTABLE_TYPES
+                )
+            except InvalidGeometry as e:
+                raise serializers.ValidationError({'geometry': str(e)})
+        elif self.instance is not None and attrs.get('type', self.instance.type) != self.instance.type:
+            # A type change alone must still leave a plantable element polygonal
+            from .geometry import normalize_geometry, InvalidGeometry
+            try:
+                normalize_geometry(self.instance.geometry, polygonal=attrs['type'] in SketchElement.PLANTABLE_TYPES)
+            except InvalidGeometry as e:
+                raise serializers.ValidationError({'type': f"The element's geometry doesn't suit {attrs['type']}: {e}"})
+        return attrs
+
     def create(self, validated_data):
-        yard = self.context['yard']
-        return SketchElement.objects.create(yard=yard, **validated_data)
+        validated_data.setdefault('yard', self.context.get('yard'))
+        return SketchElement.objects.create(**validated_data)
 
-class SprinklerHeadSerializer(serializers.ModelSerializer):
+class SprinklerHeadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     location = serializers.JSONField(required=False)
     
     class Meta:
@@ -68,7 +118,7 @@ class SprinklerHeadSerializer(serializers.ModelSerializer):
         zone = self.context['zone']
         return SprinklerHead.objects.create(zone=zone, **validated_data)
 
-class ZoneSerializer(serializers.ModelSerializer):
+class ZoneSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sprinkler_heads = SprinklerHeadSerializer(many=True, read_only=True)
 
     class Meta:
@@ -76,7 +126,7 @@ class ZoneSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['zone_number'] 
 
-class YardSerializer(serializers.ModelSerializer):
+class YardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     zones = ZoneSerializer(many=True, read_only=True)
     sketch_elements = SketchElementSerializer(many=True, read_only=True)
 
@@ -89,7 +139,7 @@ class YardSerializer(serializers.ModelSerializer):
         project = self.context['project']
         return Yard.objects.create(project=project, **validated_data)
 
-class BillOfMaterialsSerializer(serializers.ModelSerializer):   
+class BillOfMaterialsSerializer(SparseFieldsMixin, serializers.ModelSerializer):   
     class Meta:
         model = BillOfMaterials
         fields = '__all__'
@@ -100,6 +150,7 @@ class FullProjectSetupSerializer(serializers.Serializer):
     sprinkler_heads = SprinklerHeadSerializer(many=True)
     sketch_elements = SketchElementSerializer(many=True)
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         user = request.user if request else None
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.settings import api_settings
+
+from .auth import user_cache
+from .models import Yard, SketchElement, Zone, SprinklerHead
+
+
+@receiver(post_save, sender=Yard)
+def bump_yard_revision_for_yard(sender, instance, created, **kwargs):
+    if not created:
+        Yard.bump_revision(instance.pk)
+
+
+@receiver(pre_save, sender=SketchElement)
+@receiver(pre_save, sender=Zone)
+@receiver(pre_save, sender=SprinklerHead)
+def remember_previous_parent(sender, instance, **kwargs):
+    """
+    Notes the yard (for heads, the zone) an existing row is being moved away
+    from as `_moved_from`, so the handlers below bump and refresh it too.
+    """
+    instance._moved_from = None
+    if instance._state.adding or instance.pk is None:
+        return
+    field = 'zone_id' if sender is SprinklerHead else 'yard_id'
+    previous = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if previous != getattr(instance, field):
+        instance._moved_from = previous
+
+
+def _parents(instance, field):
+    return {getattr(instance, field), getattr(instance, '_moved_from', None)} - {None}
+
+
+@receiver(post_save, sender=SketchElement)
+@receiver(post_delete, sender=SketchElement)
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+def bump_yard_revision_for_child(sender, instance, **kwargs):
+    for yard_id in _parents(instance, 'yard_id'):
+        Yard.bump_revision(yard_id)
+
+
+@receiver(post_save, sender=SprinklerHead)
+@receiver(post_delete, sender=SprinklerHead)
+def bump_yard_revision_for_head(sender, instance, **kwargs):
+    zone_ids = _parents(instance, 'zone_id')
+    if zone_ids:
+        Yard.objects.filter(zones__id__in=zone_ids).update(revision=F('revision') + 1)
+
+
+class BomRefresh:
+    """on_commit callback regenerating one yard's bill of materials."""
+
+    def __init__(self, yard_id):
+        self.yard_id = yard_id
+        self.pending = True
+
+    def __call__(self):
+        from .bom import regenerate_bom  # pulls in numpy and shapely, so not at startup
+        self.pending = False
+        regenerate_bom(self.yard_id)
+
+
+def schedule_bom_refresh(yard_id):
+    """
+    Regenerates the yard's bill of materials once the current transaction
+    commits. However many rows the transaction saves, each yard is queued
+    once; the queue is the connection's own, so a refresh queued inside a
+    rolled-back savepoint is dropped along with it. A failed refresh is
+    logged rather than raised, since the write it follows has already
+    committed.
+    """
+    if yard_id is None:
+        return
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        for _, callback, _ in connection.run_on_commit:
+            if isinstance(callback, BomRefresh) and callback.pending and callback.yard_id == yard_id:
+                return
+    transaction.on_commit(BomRefresh(yard_id), robust=True)
+
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+def refresh_bom_for_zone(sender, instance, **kwargs):
+    for yard_id in _parents(instance, 'yard_id'):
+        schedule_bom_refresh(yard_id)
+
+
+@receiver(post_save, sender=SprinklerHead)
+@receiver(post_delete, sender=SprinklerHead)
+def refresh_bom_for_head(sender, instance, **kwargs):
+    if instance.zone_id is not None:
+        if SprinklerHead.zone.is_cached(instance):
+            schedule_bom_refresh(instance.zone.yard_id)
+        else:
+            schedule_bom_refresh(Zone.objects.filter(pk=instance.zone_id).values_list('yard_id', flat=True).first())
+    moved_from = getattr(instance, '_moved_from', None)
+    if moved_from is not None:
+        schedule_bom_refresh(Zone.objects.filter(pk=moved_from).values_list('yard_id', flat=True).first())
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,215 @@
+"""
+Per-yard sketch revision log for autosave and undo/redo.
+
+Each autosave appends one SketchRevision holding compact deltas:
+
+    {"op": "add", "id": 7, "after": {...element fields...}}
+    {"op": "modify", "id": 7, "before": {...changed fields...}, "after": {...}}
+    {"op": "delete", "id": 7, "before": {...element fields...}}
+
+Undo applies a revision's deltas in reverse using the "before" values and redo
+re-applies the "after" values, so both cost the size of the change rather
+than the size of the sketch. Every SNAPSHOT_INTERVAL revisions the full sketch
+is stored as well, which bounds how many deltas reconstructing any revision
+has to replay.
+"""
+from django.db import transaction
+
+from .models import Yard, SketchElement, SketchRevision
+from .serializers import SketchElementSerializer
+
+SNAPSHOT_INTERVAL = 50
+ELEMENT_FIELDS = ('type', 'geometry', 'properties')
+
+
+class SketchHistoryError(ValueError):
+    pass
+
+
+class SketchConflict(SketchHistoryError):
+    """
+    The sketch isn't where the request assumes: an autosave on top of a
+    revision that is no longer current, or an undo/redo over elements that
+    were edited outside the history.
+    """
+
+
+def _element_state(element):
+    return {field: getattr(element, field) for field in ELEMENT_FIELDS}
+
+
+def _current_state(yard):
+    elements = SketchElement.objects.filter(yard=yard).order_by('id').values('id', *ELEMENT_FIELDS)
+    return {str(e.pop('id')): e for e in elements}
+
+
+def _validated(yard, data, instance=None):
+    serializer = SketchElementSerializer(instance, data=data, partial=instance is not None, context={'yard': yard})
+    if not serializer.is_valid():
+        raise SketchHistoryError(serializer.errors)
+    return {field: serializer.validated_data[field] for field in ELEMENT_FIELDS if field in serializer.validated_data}
+
+
+def _locked_yard(yard):
+    return Yard.objects.select_for_update().get(pk=yard.pk)
+
+
+def _ensure_base_snapshot(yard):
+    """Revision 0 records the sketch as it was before history started."""
+    if not SketchRevision.objects.filter(yard=yard).exists():
+        SketchRevision.objects.create(yard=yard, sequence=0, snapshot=_current_state(yard))
+
+
+def _apply(yard, deltas, reverse=False):
+    """
+    Writes a revision's deltas (or their inverse) to the SketchElement rows.
+    Raises SketchConflict if an element isn't as the revision expects, i.e.
+    it was edited, deleted or re-created outside the sketch history.
+    """
+    for delta in (reversed(deltas) if reverse else deltas):
+        pk = delta['id']
+        expected, target = delta.get('before'), delta.get('after')
+        if reverse:
+            expected, target = target, expected
+
+        element = SketchElement.objects.filter(pk=pk).first()
+        if expected is None:
+            unchanged = element is None
+        else:
+            unchanged = (
+                element is not None and element.yard_id == yard.pk
+                and all(getattr(element, field) == value for field, value in expected.items())
+            )
+        if not unchanged:
+            raise SketchConflict(f"Sketch element {pk} was changed outside the sketch history.")
+
+        if target is None:
+            element.delete()
+        elif expected is None:
+            SketchElement.objects.create(pk=pk, yard=yard, **target)
+        else:
+            for field, value in target.items():
+                setattr(element, field, value)
+            element.save()
+
+
+def _apply_to_state(state, deltas):
+    for delta in deltas:
+        key = str(delta['id'])
+        if delta['op'] == 'delete':
+            state.pop(key, None)
+        elif delta['op'] == 'add':
+            state[key] = dict(delta['after'])
+        else:
+            state[key] = {**state[key], **delta['after']}
+    return state
+
+
+def record_autosave(yard, changes, base_sequence=None):
+    """
+    Applies a batch of client changes and appends them as one revision.
+    Changes are {"op": "add", "client_id", "type", "geometry", "properties"},
+    {"op": "modify", "id", ...changed fields} or {"op": "delete", "id"}.
+    Any redo history beyond the current position is discarded.
+
+    Returns (sequence, {client_id: element id}).
+    """
+    with transaction.atomic():
+        yard = _locked_yard(yard)
+        if base_sequence is not None and base_sequence != yard.sketch_sequence:
+            raise SketchConflict(f"Sketch is at revision {yard.sketch_sequence}, not {base_sequence}.")
+        _ensure_base_snapshot(yard)
+        SketchRevision.objects.filter(yard=yard, sequence__gt=yard.sketch_sequence).delete()
+
+        deltas, created = [], {}
+        for change in changes:
+            op = change.get('op')
+            if op == 'add':
+                fields = _validated(yard, {k: v for k, v in change.items() if k in ELEMENT_FIELDS})
+                element = SketchElement.objects.create(yard=yard, **fields)
+                deltas.append({'op': 'add', 'id': element.pk, 'after': _element_state(element)})
+                if change.get('client_id') is not None:
+                    created[str(change['client_id'])] = element.pk
+                continue
+
+            try:
+                element = SketchElement.objects.get(pk=change.get('id'), yard=yard)
+            except (SketchElement.DoesNotExist, ValueError, TypeError):
+                raise SketchHistoryError(f"Unknown sketch element: {change.get('id')}")
+
+            if op == 'modify':
+                after = _validated(yard, {k: v for k, v in change.items() if k in ELEMENT_FIELDS}, instance=element)
+                before = {field: getattr(element, field) for field in after}
+                for field, value in after.items():
+                    setattr(element, field, value)
+                element.save()
+                deltas.append({'op': 'modify', 'id': element.pk, 'before': before, 'after': after})
+            elif op == 'delete':
+                deltas.append({'op': 'delete', 'id': element.pk, 'before': _element_state(element)})
+                element.delete()
+            else:
+                raise SketchHistoryError(f"Unknown op: {op}")
+
+        sequence = yard.sketch_sequence + 1
+        snapshot = _current_state(yard) if sequence % SNAPSHOT_INTERVAL == 0 else None
+        SketchRevision.objects.create(yard=yard, sequence=sequence, deltas=deltas, snapshot=snapshot)
+        Yard.objects.filter(pk=yard.pk).update(sketch_sequence=sequence)
+        return sequence, created
+
+
+def move_to(yard, sequence):
+    """Undoes or redoes revisions one at a time until the sketch is at `sequence`."""
+    with transaction.atomic():
+        yard = _locked_yard(yard)
+        current = yard.sketch_sequence
+        if sequence == current:
+            return current
+        last = SketchRevision.objects.filter(yard=yard).order_by('-sequence').values_list('sequence', flat=True).first()
+        if last is None or not 0 <= sequence <= last:
+            raise SketchHistoryError(f"No sketch revision {sequence}.")
+
+        if sequence < current:
+            revisions = SketchRevision.objects.filter(yard=yard, sequence__gt=sequence, sequence__lte=current).order_by('-sequence')
+            for revision in revisions:
+                _apply(yard, revision.deltas, reverse=True)
+        else:
+            revisions = SketchRevision.objects.filter(yard=yard, sequence__gt=current, sequence__lte=sequence).order_by('sequence')
+            for revision in revisions:
+                _apply(yard, revision.deltas)
+
+        Yard.objects.filter(pk=yard.pk).update(sketch_sequence=sequence)
+        return sequence
+
+
+def undo(yard):
+    if yard.sketch_sequence == 0:
+        raise SketchHistoryError("Nothing to undo.")
+    return move_to(yard, yard.sketch_sequence - 1)
+
+
+def redo(yard):
+    return move_to(yard, yard.sketch_sequence + 1)
+
+
+def reconstruct(yard, sequence):
+    """
+    Sketch state ({element id: fields}) at any revision, from the nearest
+    snapshot plus at most SNAPSHOT_INTERVAL - 1 revisions of deltas.
+    """
+    base = (
+        SketchRevision.objects
+        .filter(yard=yard, sequence__lte=sequence, snapshot__isnull=False)
+        .order_by('-sequence')
+        .first()
+    )
+    if base is None:
+        raise SketchHistoryError(f"No sketch revision {sequence}.")
+    revisions = SketchRevision.objects.filter(yard=yard, sequence__gt=base.sequence, sequence__lte=sequence).order_by('sequence')
+    state = dict(base.snapshot)
+    found = base.sequence
+    for revision in revisions.values_list('sequence', 'deltas'):
+        found, deltas = revision
+        _apply_to_state(state, deltas)
+    if found != sequence:
+        raise SketchHistoryError(f"No sketch revision {sequence}.")
+    return state
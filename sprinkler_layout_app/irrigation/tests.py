@@ -1,17 +1,60 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import force_authenticate
-from irrigation.models import Project, Yard, SketchElement
-import matplotlib.pyplot as plt
+from irrigation.models import Project, Yard, SketchElement, SketchRevision, Zone, SprinklerHead, ZoneSchedule, BillOfMaterials, OutboundEmail
 from django.contrib.auth import get_user_model
 from shapely.geometry import shape
+import io
 import json
-from irrigation.layout_utils import parse_yard_geometry
-from matplotlib.patches import Wedge
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import shapely
+from irrigation.layout_utils import parse_yard_geometry, parse_yard_hydrozones, build_usable_area, build_hydrozones
+from irrigation.geometry import normalize_geometry
+from irrigation.serializers import SketchElementSerializer
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.utils import timezone
+from django.core.management import call_command
+from irrigation import middleware
+from irrigation.middleware import registry as profiling_registry, sql_signature
+from irrigation.weather import weather_source
+from irrigation.bom import regenerate_bom
+from irrigation.auth import user_cache, blacklist_filter
+from irrigation.layout.pool import compute_layout, layout_pool
+from irrigation.layout.coverage import head_footprint
+from irrigation.layout.live_coverage import MAX_HEADS, CoverageSession, coverage_sessions
+from irrigation.views import layout_payload
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
+
+def create_yard(user, name="Test Project", **fields):
+    """A new project of `user` with its yard; `fields` override the loam/fescue defaults."""
+    return Yard.objects.create(project=Project.objects.create(name=name, user=user), **{
+        'soil_type': 'loam', 'grass_type': 'fescue', 'zip_code': '12345',
+        'water_pressure': 50, 'flow_rate': 10.0, **fields,
+    })
+
+class YardTestCase(APITestCase):
+    """A user, logged in on self.client, who owns self.project and its self.yard (see create_yard)."""
+    yard_fields = {}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='yarduser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.yard = create_yard(self.user, **self.yard_fields)
+        self.project = self.yard.project
 
 class FullProjectSetupTest(APITestCase):
     
@@ -82,10 +125,9 @@ class GenerateSprinklerLayoutTest(APITestCase):
     def test_generate_layout_stub(self):
         url = '/api/v1/projects/generate-layout/'
         response = self.client.post(url, {"yard_id": self.yard.id}, format='json')
-        print("LAYOUT RESPONSE:", response.data)
         self.assertEqual(response.status_code, 200)
         self.assertIn("zones", response.data)
-        self.assertEqual(response.data["status"], "geometry_parsed")
+        self.assertEqual(response.data["status"], "sprinklers_generated")
 
 class ParseGeometryTest(APITestCase):
     def setUp(self):
@@ -177,6 +219,9 @@ class VisualLayoutTest(APITestCase):
         )
 
     def test_plot_yard_geometry(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Wedge
+
         response = self.client.post("/api/v1/projects/generate-layout/", {"yard_id": self.yard.id}, format="json")
         #print("STATUS CODE:", response.status_code)
         #print("RESPONSE CONTENT:", response.content)
@@ -236,3 +281,1052 @@ class VisualLayoutTest(APITestCase):
             ax.plot(x, y, 'ko')  # Black dot at center
 
         plt.show()
+
+@override_settings(IRRIGATION_PROFILING={'ENABLED': True, 'PROFILE_DIR': None})
+class ProfilingMiddlewareTest(YardTestCase):
+    def setUp(self):
+        profiling_registry.reset()
+        super().setUp()
+        self.staff = User.objects.create_user(username='profstaff', password='testpass123', is_staff=True)
+
+    def test_records_endpoint_stats(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get('/api/v1/yards/')
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get('/api/v1/profiling/')
+        self.assertEqual(response.status_code, 200)
+        stats = response.data["endpoints"]["GET yard-list"]
+        self.assertEqual(stats["requests"], 1)
+        self.assertGreater(stats["max_queries"], 0)
+        self.assertEqual(sum(stats["histogram"].values()), 1)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/profiling/')
+        self.assertEqual(response.status_code, 403)
+
+    async def test_async_requests_recorded(self):
+        await self.async_client.get('/api/v1/profiling/')
+        self.assertEqual(profiling_registry.snapshot()["GET profiling"]["requests"], 1)
+
+    def test_one_request_profiled_at_a_time(self):
+        self.client.force_authenticate(user=self.user)
+        with tempfile.TemporaryDirectory() as directory:
+            profiling = {'ENABLED': True, 'PROFILE_DIR': directory, 'PROFILE_SAMPLE_RATE': 1.0, 'PROFILE_THRESHOLD_MS': 0}
+            with override_settings(IRRIGATION_PROFILING=profiling):
+                with middleware._profiler_lock:
+                    self.assertEqual(self.client.get('/api/v1/yards/').status_code, 200)
+                self.assertEqual(os.listdir(directory), [])
+                self.assertEqual(self.client.get('/api/v1/yards/').status_code, 200)
+                self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_sql_signature_collapses_literals(self):
+        self.assertEqual(
+            sql_signature('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "x" = 5'),
+            sql_signature('SELECT * FROM "t" WHERE "id" IN (%s) AND "x" = 7'),
+        )
+
+class RenderLayoutTest(YardTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        SketchElement.objects.create(
+            yard=self.yard, type="full_sun",
+            geometry={"type": "Polygon", "coordinates": [[[0, 0], [40, 0], [40, 30], [0, 30], [0, 0]]]},
+        )
+        SketchElement.objects.create(
+            yard=self.yard, type="obstacle",
+            geometry={"type": "Polygon", "coordinates": [[[15, 10], [25, 10], [25, 20], [15, 20], [15, 10]]]},
+        )
+        self.url = f'/api/v1/yards/{self.yard.id}/render/'
+
+    def test_png_and_svg(self):
+        response = self.client.get(self.url, {"format": "png"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+
+        response = self.client.get(self.url, {"format": "svg"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"<svg", response.content)
+
+    def test_repeat_request_served_from_cache(self):
+        self.client.get(self.url)
+        with mock.patch('irrigation.layout.render.render_layout') as render:
+            response = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+
+    def test_sketch_edit_invalidates_cache(self):
+        self.client.get(self.url)
+        SketchElement.objects.filter(yard=self.yard, type="obstacle").delete()
+        with mock.patch('irrigation.layout.render.render_layout', return_value=b"new") as render:
+            self.client.get(self.url)
+        render.assert_called_once()
+
+    def test_render_500_heads(self):
+        from irrigation.layout.render import render_layout
+        sprinklers = [
+            {"x": (i % 25) * 8.0, "y": (i // 25) * 8.0, "radius": 10, "angle": 90 * (1 + i % 4), "direction": 0}
+            for i in range(500)
+        ]
+        area = shape({"type": "Polygon", "coordinates": [[[0, 0], [200, 0], [200, 160], [0, 160], [0, 0]]]})
+        image = render_layout(area, sprinklers, fmt="png")
+        self.assertTrue(image.startswith(b"\x89PNG"))
+
+class SketchTileTest(YardTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        SketchElement.objects.create(
+            yard=self.yard, type="full_sun",
+            geometry={"type": "Polygon", "coordinates": [[[0, 0], [100, 0], [100, 100], [0, 100], [0, 0]]]},
+        )
+        SketchElement.objects.create(
+            yard=self.yard, type="obstacle",
+            geometry={"type": "Polygon", "coordinates": [[[10, 10], [20, 10], [20, 20], [10, 20], [10, 10]]]},
+        )
+        SketchElement.objects.create(
+            yard=self.yard, type="label", geometry={"type": "Point", "coordinates": [80, 80]},
+        )
+
+    def test_tile_index(self):
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/tiles/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["origin"], [0.0, 0.0])
+        self.assertEqual(response.data["size"], 100.0)
+
+    def test_tile_clips_to_visible_elements(self):
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/tiles/1/0/0/')
+        self.assertEqual(response.status_code, 200)
+        types = sorted(f["properties"]["element_type"] for f in response.data["features"])
+        self.assertEqual(types, ["full_sun", "obstacle"])
+        lawn = next(f for f in response.data["features"] if f["properties"]["element_type"] == "full_sun")
+        self.assertEqual(shape(lawn["geometry"]).bounds, (0.0, 0.0, 50.0, 50.0))
+
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/tiles/1/1/1/')
+        types = sorted(f["properties"]["element_type"] for f in response.data["features"])
+        self.assertEqual(types, ["full_sun", "label"])
+
+    def test_tiles_follow_yard_revision(self):
+        url = f'/api/v1/yards/{self.yard.id}/tiles/0/0/0/'
+        first = self.client.get(url).data
+        SketchElement.objects.create(
+            yard=self.yard, type="slope",
+            geometry={"type": "Polygon", "coordinates": [[[60, 60], [70, 60], [70, 70], [60, 60]]]},
+        )
+        second = self.client.get(url).data
+        self.assertGreater(second["revision"], first["revision"])
+        self.assertEqual(len(second["features"]), len(first["features"]) + 1)
+
+    def test_rows_without_wkb_use_geojson(self):
+        SketchElement.objects.filter(type="obstacle").update(geometry_wkb=None)
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/tiles/1/0/0/')
+        types = sorted(f["properties"]["element_type"] for f in response.data["features"])
+        self.assertEqual(types, ["full_sun", "obstacle"])
+
+    def test_out_of_range_tile(self):
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/tiles/1/2/0/')
+        self.assertEqual(response.status_code, 404)
+
+class SketchGeometryNormalizationTest(YardTestCase):
+    def post_element(self, element_type, geometry):
+        return self.client.post('/api/v1/sketch-elements/', {
+            "yard": self.yard.id, "type": element_type, "geometry": geometry,
+        }, format='json')
+
+    def test_normalizes_and_stores_bounds(self):
+        # Collinear vertex at (20, 0) and coordinates off the 0.01 ft grid
+        response = self.post_element("full_sun", {
+            "type": "Polygon",
+            "coordinates": [[[0, 0], [20, 0], [40.0001, 0], [40, 30], [0, 30.004], [0, 0]]],
+        })
+        self.assertEqual(response.status_code, 201)
+        element = SketchElement.objects.get(id=response.data["id"])
+        self.assertEqual(len(element.geometry["coordinates"][0]), 5)
+        self.assertEqual((element.minx, element.miny, element.maxx, element.maxy), (0.0, 0.0, 40.0, 30.0))
+        self.assertAlmostEqual(element.area, 1200.0)
+
+    def test_repairs_self_intersecting_polygon(self):
+        response = self.post_element("obstacle", {
+            "type": "Polygon",
+            "coordinates": [[[0, 0], [10, 10], [10, 0], [0, 10], [0, 0]]],
+        })
+        self.assertEqual(response.status_code, 201)
+        geom = shape(SketchElement.objects.get(id=response.data["id"]).geometry)
+        self.assertTrue(geom.is_valid)
+        self.assertAlmostEqual(geom.area, 50.0)
+
+    def test_rejects_non_polygon_lawn_and_garbage(self):
+        response = self.post_element("full_sun", {"type": "Point", "coordinates": [1, 2]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("geometry", response.data)
+
+        response = self.post_element("obstacle", {"type": "Polygon", "coordinates": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_type_change_revalidates_stored_geometry(self):
+        element_id = self.post_element("label", {"type": "Point", "coordinates": [1, 2]}).data["id"]
+        url = f'/api/v1/sketch-elements/{element_id}/'
+        response = self.client.patch(url, {"type": "full_sun"}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("type", response.data)
+        self.assertEqual(self.client.patch(url, {"type": "obstacle"}, format='json').status_code, 200)
+
+    def test_line_obstacle_is_laid_out_around(self):
+        self.post_element("full_sun", {"type": "Polygon", "coordinates": [[[0, 0], [40, 0], [40, 30], [0, 30], [0, 0]]]})
+        response = self.post_element("obstacle", {"type": "LineString", "coordinates": [[5, 5], [35, 5]]})
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post('/api/v1/projects/generate-layout/', {"yard_id": self.yard.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["zones"][0]["area"], 1200.0)
+        self.assertEqual(self.client.get(f'/api/v1/yards/{self.yard.id}/layout/').status_code, 200)
+        self.assertEqual(build_usable_area(["full_sun", "obstacle"], [shapely.box(0, 0, 10, 10), shapely.Point(5, 5)]).area, 100.0)
+
+    def test_legacy_non_polygon_plantable_rows_are_skipped(self):
+        self.post_element("full_sun", {"type": "Polygon", "coordinates": [[[0, 0], [40, 0], [40, 30], [0, 30], [0, 0]]]})
+        # Saved before plantable geometry was validated
+        SketchElement.objects.create(yard=self.yard, type="partial_shade", geometry={"type": "LineString", "coordinates": [[0, 0], [60, 60]]})
+
+        self.assertEqual(parse_yard_geometry(self.yard).area, 1200.0)
+        self.assertEqual([zone["exposure"] for zone in parse_yard_hydrozones(self.yard)], ["full_sun"])
+        self.assertEqual(self.client.get(f'/api/v1/yards/{self.yard.id}/layout/').status_code, 200)
+
+class SketchElementBoundsTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            SketchElement.objects.create(
+                yard=self.yard, type="full_sun",
+                geometry={"type": "Polygon", "coordinates": [[[i * 100, 0], [i * 100 + 50, 0], [i * 100 + 50, 50], [i * 100, 50], [i * 100, 0]]]},
+            )
+        SketchElement.objects.create(yard=self.yard, type="label", geometry={"type": "Point", "coordinates": [10, 10]})
+
+    def test_bounds_filled_on_save(self):
+        element = SketchElement.objects.filter(yard=self.yard, type="full_sun").order_by('id').last()
+        self.assertEqual((element.minx, element.miny, element.maxx, element.maxy), (400.0, 0.0, 450.0, 50.0))
+        self.assertEqual(element.area, 2500.0)
+
+        element.geometry = {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}
+        element.save(update_fields=['geometry'])
+        element.refresh_from_db()
+        self.assertEqual(element.maxx, 1.0)
+
+    def test_region_query(self):
+        hits = SketchElement.objects.filter(yard=self.yard).intersecting((120, 10, 260, 20))
+        self.assertEqual(hits.count(), 2)
+        self.assertEqual(SketchElement.objects.filter(yard=self.yard).layout_inputs().count(), 5)
+
+        area = parse_yard_geometry(self.yard, bounds=(0, 0, 60, 60))
+        self.assertEqual(area.area, 2500.0)
+
+class SketchElementWKBTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lawn = SketchElement.objects.create(
+            yard=self.yard, type="full_sun",
+            geometry={"type": "Polygon", "coordinates": [[[0, 0], [40, 0], [40, 30], [0, 30], [0, 0]]]},
+        )
+        SketchElement.objects.create(
+            yard=self.yard, type="obstacle",
+            geometry={"type": "Polygon", "coordinates": [[[15, 10], [25, 10], [25, 20], [15, 20], [15, 10]]]},
+        )
+
+    def test_wkb_maintained_on_save(self):
+        self.lawn.refresh_from_db()
+        self.assertEqual(shapely.from_wkb(bytes(self.lawn.geometry_wkb)), shape(self.lawn.geometry))
+
+    def test_parse_reads_wkb_and_falls_back_to_json(self):
+        self.assertEqual(parse_yard_geometry(self.yard).area, 1100.0)
+
+        SketchElement.objects.filter(id=self.lawn.id).update(geometry_wkb=None)
+        self.assertEqual(parse_yard_geometry(self.yard).area, 1100.0)
+
+    def test_api_omits_binary_column(self):
+        data = SketchElementSerializer(self.lawn).data
+        self.assertNotIn("geometry_wkb", data)
+
+class BuildUsableAreaTest(TestCase):
+    def test_matches_plain_union_and_difference(self):
+        plantable = [shapely.box(0, 0, 40, 30), shapely.box(30, 0, 70, 30), shapely.box(100, 0, 120, 20)]
+        obstacles = [shapely.box(10, 10, 20, 20), shapely.box(15, 15, 25, 25), shapely.box(105, 5, 110, 10), shapely.box(500, 500, 510, 510)]
+        types = ["full_sun", "partial_shade", "full_shade"] + ["obstacle"] * 4
+
+        area = build_usable_area(types, plantable + obstacles)
+        expected = shapely.union_all(plantable).difference(shapely.union_all(obstacles))
+        self.assertTrue(area.is_valid)
+        self.assertEqual(area.geom_type, "MultiPolygon")
+        self.assertAlmostEqual(area.symmetric_difference(expected).area, 0.0)
+
+    def test_ignores_other_types_and_empty_input(self):
+        self.assertTrue(build_usable_area([], []).is_empty)
+        area = build_usable_area(["label", "full_sun"], [shapely.Point(1, 1), shapely.box(0, 0, 10, 10)])
+        self.assertEqual(area.geom_type, "Polygon")
+        self.assertEqual(area.area, 100.0)
+
+class SketchHistoryTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/v1/yards/{self.yard.id}/sketch/'
+        self.square = {"type": "Polygon", "coordinates": [[[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]]}
+
+    def autosave(self, deltas, **extra):
+        return self.client.post(self.url + 'autosave/', {"deltas": deltas, **extra}, format='json')
+
+    def elements(self):
+        return {e.id: (e.type, e.properties) for e in SketchElement.objects.filter(yard=self.yard)}
+
+    def test_autosave_undo_redo(self):
+        response = self.autosave([{"op": "add", "client_id": "a", "type": "full_sun", "geometry": self.square}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["sequence"], 1)
+        element_id = response.data["created"]["a"]
+
+        self.autosave([{"op": "modify", "id": element_id, "properties": {"color": "green"}}], base_sequence=1)
+        self.autosave([{"op": "delete", "id": element_id}])
+        self.assertEqual(self.elements(), {})
+
+        self.assertEqual(self.client.post(self.url + 'undo/').data["sequence"], 2)
+        self.assertEqual(self.elements(), {element_id: ("full_sun", {"color": "green"})})
+        self.client.post(self.url + 'undo/')
+        self.assertEqual(self.elements(), {element_id: ("full_sun", {})})
+        self.client.post(self.url + 'redo/')
+        self.assertEqual(self.elements(), {element_id: ("full_sun", {"color": "green"})})
+
+        response = self.client.post(self.url + 'checkout/', {"sequence": 0}, format='json')
+        self.assertEqual(response.data["sequence"], 0)
+        self.assertEqual(self.elements(), {})
+        self.assertEqual(self.client.post(self.url + 'undo/').status_code, 400)
+
+    def test_new_autosave_discards_redo_and_rejects_stale_base(self):
+        self.autosave([{"op": "add", "type": "obstacle", "geometry": self.square}])
+        self.autosave([{"op": "add", "type": "obstacle", "geometry": self.square}])
+        self.client.post(self.url + 'undo/')
+        self.assertEqual(self.autosave([{"op": "add", "type": "slope", "geometry": self.square}]).data["sequence"], 2)
+        self.assertEqual(self.client.post(self.url + 'redo/').status_code, 400)
+        self.assertEqual(self.autosave([{"op": "delete", "id": 1}], base_sequence=1).status_code, 409)
+
+    def test_reconstruct_across_snapshots(self):
+        with mock.patch('irrigation.sketch_history.SNAPSHOT_INTERVAL', 3):
+            for i in range(7):
+                self.autosave([{"op": "add", "type": "obstacle", "geometry": self.square, "properties": {"n": i}}])
+        self.assertEqual(SketchRevision.objects.filter(yard=self.yard, snapshot__isnull=False).count(), 3)
+
+        response = self.client.get(self.url + 'revisions/5/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(e["properties"]["n"] for e in response.data["elements"].values()), [0, 1, 2, 3, 4])
+        self.assertEqual(self.client.get(self.url + 'revisions/9/').status_code, 404)
+
+    def test_undo_over_outside_edits_conflicts(self):
+        element_id = self.autosave([{"op": "add", "client_id": "a", "type": "obstacle", "geometry": self.square}]).data["created"]["a"]
+        self.autosave([{"op": "modify", "id": element_id, "properties": {"n": 1}}])
+        self.client.patch(f'/api/v1/sketch-elements/{element_id}/', {"properties": {"n": 2}}, format='json')
+        self.assertEqual(self.client.post(self.url + 'undo/').status_code, 409)
+        self.assertEqual(self.elements(), {element_id: ("obstacle", {"n": 2})})
+
+        self.client.delete(f'/api/v1/sketch-elements/{element_id}/')
+        response = self.client.post(self.url + 'checkout/', {"sequence": 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Yard.objects.get(pk=self.yard.pk).sketch_sequence, 2)
+
+    def test_invalid_delta(self):
+        response = self.autosave([{"op": "add", "type": "full_sun", "geometry": {"type": "Point", "coordinates": [0, 0]}}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SketchRevision.objects.filter(yard=self.yard, sequence__gt=0).exists())
+
+class YardETagTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/v1/yards/{self.yard.id}/'
+
+    def test_unchanged_yard_returns_304_with_one_query(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_child_writes_change_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        zone = Zone.objects.create(yard=self.yard)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        SprinklerHead.objects.create(zone=zone, type="rotor", throw_radius=15, flow_rate=2)
+        self.assertNotEqual(self.client.get(self.url)["ETag"], etag)
+
+    def test_stale_instance_does_not_roll_back_revision(self):
+        stale = Yard.objects.get(pk=self.yard.pk)
+        SketchElement.objects.create(yard=self.yard, type="label", geometry={"type": "Point", "coordinates": [0, 0]})
+        stale.soil_type = "clay"
+        stale.save()
+        self.yard.refresh_from_db()
+        self.assertEqual(self.yard.revision, 2)
+        self.assertEqual(self.yard.soil_type, "clay")
+
+    def test_layout_endpoint_is_conditional(self):
+        url = f'/api/v1/yards/{self.yard.id}/layout/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertNotEqual(response["ETag"], self.client.get(self.url)["ETag"])
+
+    def test_accept_header_selects_etag_variant(self):
+        url = f'/api/v1/yards/{self.yard.id}/render/'
+        png = self.client.get(url, HTTP_ACCEPT="image/png")
+        response = self.client.get(url, HTTP_ACCEPT="image/svg+xml", HTTP_IF_NONE_MATCH=png["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn("Accept", response["Vary"])
+
+    def test_moving_children_bumps_old_yard(self):
+        other = create_yard(self.user, name="Other")
+        zone = Zone.objects.create(yard=self.yard)
+        other_zone = Zone.objects.create(yard=other)
+        head = SprinklerHead.objects.create(zone=zone, type="rotor", throw_radius=15, flow_rate=2)
+
+        revision = Yard.objects.get(pk=self.yard.pk).revision
+        head.zone = other_zone
+        head.save()
+        self.assertEqual(Yard.objects.get(pk=self.yard.pk).revision, revision + 1)
+        zone.yard, zone.zone_number = other, 2
+        zone.save()
+        self.assertEqual(Yard.objects.get(pk=self.yard.pk).revision, revision + 2)
+
+class ProjectDashboardTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dashuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        for i in range(30):
+            if i % 2:
+                Project.objects.create(name=f"Project {i}", user=self.user)
+                continue
+            yard = create_yard(self.user, name=f"Project {i}")
+            for _ in range(2):
+                zone = Zone.objects.create(yard=yard)
+                for _ in range(3):
+                    SprinklerHead.objects.create(zone=zone, type="spray", throw_radius=12, flow_rate=1.5)
+        other = User.objects.create_user(username='otherdash', password='testpass123')
+        Project.objects.create(name="Not mine", user=other)
+
+    def test_aggregates_and_cursor_pages(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/projects/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 25)
+        self.assertIsNotNone(response.data["next"])
+
+        rows = response.data["results"] + self.client.get(response.data["next"]).data["results"]
+        self.assertEqual(len(rows), 30)
+        with_yard = [r for r in rows if r["yard_id"]]
+        self.assertEqual(len(with_yard), 15)
+        for row in with_yard:
+            self.assertEqual((row["zone_count"], row["head_count"], row["total_gpm"]), (2, 6, 9.0))
+        for row in rows:
+            if not row["yard_id"]:
+                self.assertEqual((row["zone_count"], row["head_count"], row["total_gpm"]), (0, 0, 0.0))
+
+class ListPaginationTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.zones = [Zone.objects.create(yard=self.yard) for _ in range(2)]
+        for zone in self.zones:
+            for i in range(40):
+                SprinklerHead.objects.create(zone=zone, type="spray", location={"x": i, "y": 0}, throw_radius=12, flow_rate=1.5)
+
+    def test_heads_are_cursor_paginated(self):
+        response = self.client.get('/api/v1/sprinkler-heads/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 50)
+        rest = self.client.get(response.data["next"]).data
+        self.assertEqual(len(rest["results"]), 30)
+        self.assertIsNone(rest["next"])
+
+    def test_zone_filter_and_sparse_fields(self):
+        zone = self.zones[0]
+        response = self.client.get(f'/api/v1/sprinkler-heads/?zone={zone.id}&fields=id,location&page_size=100')
+        self.assertEqual(len(response.data["results"]), 40)
+        self.assertEqual(set(response.data["results"][0]), {"id", "location"})
+        self.assertTrue(all(h.zone_id == zone.id for h in SprinklerHead.objects.filter(id__in=[r["id"] for r in response.data["results"]])))
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get('/api/v1/sprinkler-heads/?zone=abc')
+        self.assertEqual(response.status_code, 400)
+
+    def test_yard_list_prefetches_nested_rows(self):
+        for i in range(3):
+            create_yard(self.user, name=f"Extra {i}")
+        # yards, zones, heads and sketch elements, however many yards are listed
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/yards/')
+        self.assertEqual(len(response.data["results"]), 4)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/yards/?fields=id,zip_code')
+        self.assertEqual(set(response.data["results"][0]), {"id", "zip_code"})
+
+class WaterBudgetTest(YardTestCase):
+    yard_fields = {'soil_type': 'Clay', 'grass_type': 'Tall Fescue', 'zip_code': '85004'}
+
+    def setUp(self):
+        super().setUp()
+        self.zone = Zone.objects.create(yard=self.yard)
+        # Four quarter-circle heads on a 15 ft square, 1.0 GPM each
+        for x, y in [(0, 0), (15, 0), (0, 15), (15, 15)]:
+            SprinklerHead.objects.create(zone=self.zone, type="spray", location={"x": x, "y": y},
+                                         throw_radius=15, flow_rate=1.0, angle=90)
+
+    def test_precipitation_rate_uses_head_spacing(self):
+        from irrigation.water_budget import precipitation_rate
+        # 4 GPM over one 15 x 15 ft square
+        pr = precipitation_rate([1.0] * 4, [90] * 4, [15] * 4, [(0, 0), (15, 0), (0, 15), (15, 15)])
+        self.assertAlmostEqual(pr, 96.25 * 4 / 225)
+        # No locations: spacing falls back to the throw radius
+        self.assertAlmostEqual(precipitation_rate([2.0], [360], [10]), 96.25 * 2 / 100)
+
+    def test_yard_budget_endpoint(self):
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/water-budget/?month=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["site"]["assumed"], [])
+        self.assertEqual(response.data["site"]["et0"], 0.39)  # Phoenix prefix 850, July
+        zone = response.data["zones"][0]
+        self.assertAlmostEqual(zone["precipitation_rate"], round(96.25 * 4 / 225, 3))
+        # PR 1.71 in/hr on clay (0.1 in/hr intake) needs the runtime split into cycles
+        self.assertEqual(zone["cycles"], 18)
+        self.assertGreater(zone["runtime_minutes"], 0)
+        self.assertEqual(self.client.get(f'/api/v1/yards/{self.yard.id}/water-budget/?month=13').status_code, 400)
+
+    def test_malformed_locations_count_as_unplaced(self):
+        for location in ({"x": "abc", "y": 1}, {"x": None, "y": 1}, {"x": "nan", "y": 1}):
+            SprinklerHead.objects.create(zone=Zone.objects.create(yard=self.yard), type="spray", location=location,
+                                         throw_radius=10, flow_rate=2.0, angle=360)
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/water-budget/?month=7')
+        self.assertEqual(response.status_code, 200)
+        # A lone unplaced head falls back to throw-radius spacing
+        self.assertEqual([zone["precipitation_rate"] for zone in response.data["zones"][1:]], [round(96.25 * 2 / 100, 3)] * 3)
+
+class ComputeSchedulesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='scheduser', password='testpass123')
+        self.zones = []
+        for zip_code in ('85004', '98101'):
+            yard = create_yard(self.user, name=zip_code, zip_code=zip_code)
+            zone = Zone.objects.create(yard=yard)
+            SprinklerHead.objects.create(zone=zone, type="spray", throw_radius=12, flow_rate=1.5)
+            self.zones.append(zone)
+        Zone.objects.create(yard=yard)  # no heads yet
+
+    def run_command(self, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("zip_prefix,date,et0_in,rain_in\n" + "".join(rows))
+        self.addCleanup(os.remove, f.name)
+        weather_source.cache_clear()
+        self.addCleanup(weather_source.cache_clear)
+        with override_settings(IRRIGATION_WEATHER={'SOURCE': 'irrigation.weather.FileWeatherSource', 'FILE': f.name}):
+            call_command('compute_schedules', '--week-start', '2026-07-06', '--workers', '0', '--chunk-size', '1', stdout=io.StringIO())
+
+    def test_rain_offsets_watering_and_reruns_upsert(self):
+        rainy_week = [f"981,2026-07-{6 + i:02d},0.15,0.5\n" for i in range(7)]
+        self.run_command(rainy_week)
+        self.assertEqual(ZoneSchedule.objects.count(), 3)
+        phoenix, seattle = (ZoneSchedule.objects.get(zone=z) for z in self.zones)
+        self.assertGreater(phoenix.weekly_minutes, 0)
+        self.assertEqual(phoenix.rain_inches, 0)
+        self.assertEqual(seattle.weekly_minutes, 0)
+        self.assertEqual(seattle.rain_inches, 3.5)
+
+        self.run_command([])
+        self.assertEqual(ZoneSchedule.objects.count(), 3)
+        self.assertGreater(ZoneSchedule.objects.get(zone=self.zones[1]).weekly_minutes, 0)
+
+class ZoneHydraulicsTest(YardTestCase):
+    yard_fields = {'water_pressure': 35}
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zone = Zone.objects.create(yard=self.yard, valve_location={"x": 0, "y": 0})
+            self.heads = [
+                SprinklerHead.objects.create(zone=self.zone, type=head_type, location={"x": x, "y": 0}, throw_radius=10, flow_rate=2.0)
+                for x, head_type in [(20, "spray"), (10, "spray"), (30, "rotor")]
+            ]
+            SprinklerHead.objects.create(zone=self.zone, type="spray", throw_radius=10, flow_rate=2.0)
+        BillOfMaterials.objects.all().delete()
+
+    def test_line_of_heads(self):
+        response = self.client.get(f'/api/v1/zones/{self.zone.id}/hydraulics/')
+        self.assertEqual(response.status_code, 200)
+        near, middle, far = self.heads[1], self.heads[0], self.heads[2]
+        segments = {s["to"]: s for s in response.data["segments"]}
+        self.assertEqual((segments[near.id]["from"], segments[near.id]["flow"]), ("valve", 6.0))
+        self.assertEqual((segments[middle.id]["from"], segments[middle.id]["flow"]), (near.id, 4.0))
+        self.assertEqual((segments[far.id]["from"], segments[far.id]["flow"]), (middle.id, 2.0))
+        # 6 GPM needs 3/4" to stay under 5 ft/s; 4 GPM fits in 1/2"
+        self.assertEqual(segments[near.id]["size"], '3/4"')
+        self.assertEqual(segments[middle.id]["size"], '1/2"')
+        self.assertEqual(response.data["pipe_lengths"], {'3/4"': 10.0, '1/2"': 20.0})
+
+        pressures = {h["id"]: h for h in response.data["heads"]}
+        self.assertGreater(pressures[near.id]["pressure"], pressures[far.id]["pressure"])
+        self.assertFalse(pressures[near.id]["low_pressure"])
+        self.assertTrue(pressures[far.id]["low_pressure"])  # rotor needs 40 psi
+        self.assertEqual(response.data["low_pressure_heads"], 1)
+        self.assertEqual(len(response.data["unplaced_heads"]), 1)
+
+    def test_non_numeric_location_is_unplaced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/v1/sprinkler-heads/{self.heads[2].id}/', {
+                "location": {"x": "a", "y": 1},
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(BillOfMaterials.objects.filter(project_id=self.zone.yard.project_id).exists())
+
+        response = self.client.get(f'/api/v1/zones/{self.zone.id}/hydraulics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["heads"]), 2)
+        self.assertEqual(len(response.data["unplaced_heads"]), 2)
+
+class BillOfMaterialsGenerationTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zone = Zone.objects.create(yard=self.yard, valve_location={"x": 0, "y": 0})
+            for x, head_type, angle in [(10, "spray", 90), (20, "spray", 180), (30, "Rotor", 360)]:
+                SprinklerHead.objects.create(zone=self.zone, type=head_type, location={"x": x, "y": 0},
+                                             throw_radius=10, flow_rate=2.0, angle=angle)
+
+    def items(self, data):
+        return {(i["category"], i["type"]): i for i in data["items"]}
+
+    def test_generated_items_and_cost(self):
+        response = self.client.get(f'/api/v1/projects/{self.project.id}/bom/')
+        self.assertEqual(response.status_code, 200)
+        items = self.items(response.data)
+        self.assertEqual(items[("head", "spray")]["quantity"], 2)
+        self.assertEqual(items[("head", "rotor")]["quantity"], 1)
+        self.assertEqual({k[1]: v["quantity"] for k, v in items.items() if k[0] == "nozzle"}, {"full": 1, "half": 1, "quarter": 1})
+        # 10 ft of 3/4" then 20 ft of 1/2", plus waste
+        self.assertEqual(items[("pipe", '3/4"')]["quantity"], 11)
+        self.assertEqual(items[("pipe", '1/2"')]["quantity"], 22)
+        self.assertEqual(items[("fitting", "tee")]["quantity"], 2)
+        self.assertEqual(items[("fitting", "elbow")]["quantity"], 1)
+        self.assertEqual(items[("fitting", "reducer")]["quantity"], 1)
+        self.assertEqual(items[("valve", "zone_valve")]["quantity"], 1)
+        self.assertAlmostEqual(response.data["estimated_cost"], sum(i["cost"] for i in response.data["items"]))
+
+        # Current BOMs are served without regenerating
+        with self.assertNumQueries(4):
+            self.client.get(f'/api/v1/projects/{self.project.id}/bom/')
+
+    def test_regenerated_when_heads_change(self):
+        regenerate_bom(self.yard.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            SprinklerHead.objects.create(zone=self.zone, type="spray", location={"x": 40, "y": 0},
+                                         throw_radius=10, flow_rate=2.0, angle=90)
+        bom = BillOfMaterials.objects.get(project=self.project)
+        self.assertEqual(self.items({"items": bom.items})[("head", "spray")]["quantity"], 3)
+        self.assertEqual(bom.yard_revision, Yard.objects.get(pk=self.yard.pk).revision)
+
+    def test_one_refresh_per_yard_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            other = Zone.objects.create(yard=self.yard, zone_number=2)
+            for x in (40, 50):
+                SprinklerHead.objects.create(zone=self.zone, type="spray", location={"x": x, "y": 0},
+                                             throw_radius=10, flow_rate=2.0, angle=90)
+            SprinklerHead.objects.filter(zone=self.zone).first().delete()
+            other.delete()
+        self.assertEqual(len(callbacks), 1)
+
+class OutboundEmailTest(APITestCase):
+    def register(self, username):
+        return self.client.post('/api/v1/register/', {
+            "username": username, "email": f"{username}@example.com", "password": "NewPass123!"
+        })
+
+    def test_register_queues_and_command_sends(self):
+        response = self.register('queued')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.to), ('pending', ['queued@example.com']))
+
+        call_command('send_queued_email', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("verify-email", mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+
+    def test_failures_back_off_then_give_up(self):
+        self.register('flaky')
+        with mock.patch('irrigation.outbox.EmailMessage.send', side_effect=OSError("relay down")):
+            call_command('send_queued_email', stdout=io.StringIO())
+            email = OutboundEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'relay down'))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            # Not due yet, so a second run leaves it alone
+            call_command('send_queued_email', stdout=io.StringIO())
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            call_command('send_queued_email', '--max-attempts', '2', stdout=io.StringIO())
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('failed', 2))
+        self.assertEqual(len(mail.outbox), 0)
+
+class CachedJWTAuthTest(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        blacklist_filter.reset()
+        self.user = User.objects.create_user(username='jwtuser', password='NewPass123!')
+        tokens = self.client.post('/api/v1/token/', {"username": "jwtuser", "password": "NewPass123!"}).data
+        self.access, self.refresh = tokens["access"], tokens["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def test_user_cached_until_saved(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get('/api/v1/projects/').status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get('/api/v1/projects/').status_code, 200)
+        self.assertEqual(len(second), len(first) - 1)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/projects/').status_code, 401)
+
+    def test_blacklist_prefilter(self):
+        other = self.client.post('/api/v1/token/', {"username": "jwtuser", "password": "NewPass123!"}).data["refresh"]
+        self.assertEqual(self.client.post('/api/v1/logout/', {"refresh": self.refresh}).status_code, 205)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/v1/token/refresh/', {"refresh": self.refresh}).status_code, 401)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post('/api/v1/token/refresh/', {"refresh": other}).status_code, 200)
+        self.assertFalse(any("blacklistedtoken" in q["sql"] for q in queries))
+
+    @override_settings(IRRIGATION_AUTH={'BLACKLIST_SYNC_SECONDS': 0})
+    def test_blacklist_row_committed_out_of_id_order(self):
+        early = OutstandingToken.objects.get(jti=RefreshToken(self.refresh)['jti'])
+        late = OutstandingToken.objects.create(user=self.user, jti="late", token="y", expires_at=timezone.now() + timedelta(days=1))
+        BlacklistedToken.objects.create(id=10, token=late)
+        self.assertTrue(blacklist_filter.might_contain("late"))
+        # A transaction that took id 5 commits after the filter moved past it
+        BlacklistedToken.objects.create(id=5, token=early)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/v1/token/refresh/', {"refresh": self.refresh}).status_code, 401)
+
+    def test_purge_expired_tokens(self):
+        expired = OutstandingToken.objects.create(user=self.user, jti="old", token="x", expires_at=timezone.now() - timedelta(days=1))
+        BlacklistedToken.objects.create(token=expired)
+        call_command('purge_tokens', '--batch-size', '1', stdout=io.StringIO())
+        self.assertFalse(OutstandingToken.objects.filter(jti="old").exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertTrue(OutstandingToken.objects.exists())  # the live refresh token
+
+def _exit_worker(rows):
+    os._exit(1)  # a layout worker killed mid-job, e.g. by the OOM killer
+
+@override_settings(IRRIGATION_LAYOUT_POOL={'WORKERS': 0, 'MAX_PENDING': 4})
+class AsyncLayoutTest(YardTestCase):
+    def setUp(self):
+        layout_pool.shutdown()
+        self.addCleanup(layout_pool.shutdown)
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        SketchElement.objects.create(yard=self.yard, type="full_sun", geometry={
+            "type": "Polygon", "coordinates": [[[0, 0], [40, 0], [40, 30], [0, 30], [0, 0]]]})
+        SketchElement.objects.create(yard=self.yard, type="obstacle", geometry={
+            "type": "Polygon", "coordinates": [[[15, 10], [25, 10], [25, 20], [15, 20], [15, 10]]]})
+        self.url = f'/api/v1/yards/{self.yard.id}/layout/async/'
+
+    def test_matches_sync_layout_and_is_conditional(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(user=self.user)
+        expected = self.client.get(f'/api/v1/yards/{self.yard.id}/layout/').data
+        self.assertEqual(json.loads(json.dumps(expected)), response.json())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_auth_and_ownership(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        other = User.objects.create_user(username='asyncother', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(IRRIGATION_LAYOUT_POOL={'WORKERS': 0, 'MAX_PENDING': 0})
+    def test_saturated_pool_returns_429(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_worker_process(self):
+        rows = [(element.type, bytes(element.geometry_wkb), None) for element in self.yard.sketch_elements.order_by('id')]
+        with override_settings(IRRIGATION_LAYOUT_POOL={'WORKERS': 1, 'MAX_PENDING': 1}):
+            future = layout_pool.submit(compute_layout, rows)
+            self.assertEqual(future.result(timeout=60), layout_payload(self.yard))
+
+    @override_settings(IRRIGATION_LAYOUT_POOL={'WORKERS': 1, 'MAX_PENDING': 1})
+    def test_dead_worker_returns_503_and_pool_recovers(self):
+        with mock.patch('irrigation.views.compute_layout', _exit_worker):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+class LayoutStreamTest(YardTestCase):
+    def setUp(self):
+        super().setUp()
+        SketchElement.objects.create(yard=self.yard, type="full_sun", geometry={
+            "type": "Polygon", "coordinates": [[[0, 0], [120, 0], [120, 90], [0, 90], [0, 0]]]})
+
+    def events(self, response):
+        body = b"".join(response.streaming_content).decode()
+        return [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in body.strip().split("\n\n")
+        ]
+
+    def test_streams_heads_by_stage(self):
+        response = self.client.get(f'/api/v1/yards/{self.yard.id}/layout/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = self.events(response)
+
+        self.assertEqual(events[0][0], "start")
+        self.assertEqual(events[1][1]["stage"], "corners")  # corners arrive before any other pass
+        self.assertEqual([data["stage"] for name, data in events if name == "stage"], ["corners", "edges", "interior"])
+        self.assertGreater(sum(1 for name, data in events if name == "heads" and data["stage"] == "interior"), 1)
+
+        streamed = [head for name, data in events if name == "heads" for head in data["heads"]]
+        expected = self.client.get(f'/api/v1/yards/{self.yard.id}/layout/').data["sprinklers"]
+        self.assertEqual(streamed, json.loads(json.dumps(expected)))
+        self.assertEqual(events[-1], ("done", {"total": len(streamed), "elapsed_ms": events[-1][1]["elapsed_ms"]}))
+
+    def test_unreadable_sketch_is_an_error_event(self):
+        with mock.patch('irrigation.layout_utils.build_hydrozones', side_effect=ValueError("bad ring")):
+            response = self.client.get(f'/api/v1/yards/{self.yard.id}/layout/stream/', HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(response.status_code, 200)
+            events = self.events(response)
+        self.assertEqual(events, [("error", {"error": "Could not read the yard's sketch: bad ring"})])
+
+    def test_missing_yard_is_an_error_event(self):
+        response = self.client.get('/api/v1/yards/999999/layout/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(response.content.startswith(b"event: error\n"))
+
+class ImportCostTest(TestCase):
+    HEAVY_MODULES = ("shapely", "numpy", "matplotlib")
+
+    def import_times(self, code):
+        """{module: cumulative microseconds} from `python -X importtime` running `code` in a fresh process."""
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, env=os.environ.copy(), timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, module = line.split("|")
+                if cumulative.strip().isdigit():
+                    times[module.strip()] = int(cumulative)
+        return times
+
+    def test_startup_skips_geometry_and_plotting(self):
+        # Setup plus the URLconf is what system checks, and so every management command, load
+        times = self.import_times("import django; django.setup(); import irrigation.urls")
+        self.assertIn("irrigation.views", times)
+        loaded = sorted(m for m in times if m.split(".")[0] in self.HEAVY_MODULES)
+        self.assertEqual(loaded, [])
+
+    def test_layout_code_still_loads_on_demand(self):
+        times = self.import_times("import django; django.setup(); import irrigation.layout.render")
+        self.assertIn("matplotlib", times)
+        self.assertIn("shapely", times)
+
+class LoadTestDatabaseCommandTest(TestCase):
+    def test_reports_both_connection_modes(self):
+        out = io.StringIO()
+        call_command('loadtest_db', '--requests', '20', stdout=out)
+        rows = {line.split()[0]: line.split()[1:] for line in out.getvalue().splitlines()[2:]}
+        self.assertEqual(set(rows), {"per-request", "configured"})
+        self.assertEqual(rows["configured"][0], "20")
+
+class LayoutGeoJSONCommandTest(APITestCase):
+    LAWN = {"type": "Polygon", "coordinates": [[[0, 0], [50, 0], [50, 40], [0, 40], [0, 0]]]}
+    SHED = {"type": "Polygon", "coordinates": [[[20, 15], [30, 15], [30, 25], [20, 25], [20, 15]]]}
+
+    def collection(self, yard_id, *elements):
+        return {"type": "FeatureCollection", "id": yard_id, "features": [
+            {"type": "Feature", "geometry": geometry, "properties": {"element_type": element_type}}
+            for element_type, geometry in elements
+        ]}
+
+    def test_matches_api_layout_without_database(self):
+        user = User.objects.create_user(username='geojsonuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        yard = create_yard(user)
+        # Stored as the API would store them, normalized on ingest
+        SketchElement.objects.create(yard=yard, type="full_sun", geometry=normalize_geometry(self.LAWN, polygonal=True)[0])
+        SketchElement.objects.create(yard=yard, type="obstacle", geometry=normalize_geometry(self.SHED)[0])
+        expected = json.loads(json.dumps(self.client.get(f'/api/v1/yards/{yard.id}/layout/').data))
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "a.geojson"), "w") as f:
+                json.dump(self.collection("a", ("full_sun", self.LAWN), ("obstacle", self.SHED), ("label", self.SHED)), f)
+            with open(os.path.join(directory, "more.ndjson"), "w") as f:
+                f.write(json.dumps(self.collection("empty")) + "\n\n")
+                f.write(json.dumps(self.collection("bad", ("full_sun", {"type": "Point", "coordinates": [1, 1]}))) + "\n")
+                f.write('{"type": "FeatureCollection", "features": [\n["not", "a", "collection"]\n')
+            output = os.path.join(directory, "out.ndjson")
+            with self.assertNumQueries(0):
+                call_command('layout_geojson', directory, '--workers', '0', '--output', output, stderr=io.StringIO())
+            with open(output) as f:
+                lines = [json.loads(line) for line in f]
+            results = {result["id"]: result for result in lines if "id" in result}
+            unreadable = {result["source"].rsplit(":", 1)[-1]: result["error"] for result in lines if "id" not in result}
+
+        self.assertEqual({k: v for k, v in results["a"].items() if k not in ("id", "source")}, expected)
+        self.assertEqual(results["empty"]["sprinklers"], [])
+        self.assertTrue(results["empty"]["source"].endswith("more.ndjson:1"))
+        self.assertIn("InvalidGeometry", results["bad"]["error"])
+        # Malformed records get an error line and the run goes on
+        self.assertIn("JSONDecodeError", unreadable["4"])
+        self.assertIn("got list", unreadable["5"])
+
+class LiveCoverageTest(YardTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        SketchElement.objects.create(yard=self.yard, type="full_sun", geometry={
+            "type": "Polygon", "coordinates": [[[0, 0], [60, 0], [60, 40], [0, 40], [0, 0]]]})
+        self.url = f'/api/v1/yards/{self.yard.id}/coverage/'
+
+    def test_deltas_match_full_recompute(self):
+        heads = [{"x": x, "y": y, "radius": 10} for x in (10, 30, 50) for y in (10, 30)]
+        started = self.client.post(self.url, {"sprinklers": heads}, format="json")
+        self.assertEqual(started.status_code, 201)
+        delta_url = f'{self.url}{started.data["session"]}/'
+
+        moved = {"x": 45, "y": 5, "radius": 10}
+        added = {"x": 30, "y": 20, "radius": 12, "angle": 180, "direction": 90}
+        with self.assertNumQueries(1):
+            response = self.client.post(delta_url, {"remove": heads[0], "add": moved}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["changes"]), 2)
+        response = self.client.post(delta_url, {"add": added}, format="json")
+
+        area = parse_yard_geometry(self.yard)
+        full = CoverageSession(self.yard.id, 0, area, heads[1:] + [moved, added])
+        for key in ("under_covered_area", "over_covered_area", "usable_area"):
+            self.assertEqual(response.data[key], full.totals()[key])
+        change = response.data["changes"][0]
+        rows, cols, _ = head_footprint(added, full.origin, full.cell_size, full.shape)
+        self.assertEqual({k: change[k] for k in ("under_covered", "over_covered")}, full.regions(rows, cols))
+
+    def test_generated_layout_session_and_invalidation(self):
+        started = self.client.post(self.url, {}, format="json")
+        self.assertEqual(started.status_code, 201)
+        self.assertGreater(started.data["usable_area"], 0)
+        delta_url = f'{self.url}{started.data["session"]}/'
+
+        self.assertEqual(self.client.post(delta_url, {"add": {"x": 1, "y": 1}}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(f'{self.url}nope/', {"add": {"x": 1, "y": 1, "radius": 5}}, format="json").status_code, 404)
+        SketchElement.objects.create(yard=self.yard, type="label", geometry={"type": "Point", "coordinates": [1, 1]})
+        self.assertEqual(self.client.post(delta_url, {"add": {"x": 1, "y": 1, "radius": 5}}, format="json").status_code, 409)
+
+    def test_sessions_live_in_shared_cache_and_are_capped(self):
+        too_many = [{"x": 1, "y": 1, "radius": 5}] * (MAX_HEADS + 1)
+        self.assertEqual(self.client.post(self.url, {"sprinklers": too_many}, format="json").status_code, 400)
+
+        session_id = self.client.post(self.url, {"sprinklers": []}, format="json").data["session"]
+        delta_url = f'{self.url}{session_id}/'
+        self.client.post(delta_url, {"add": {"x": 30, "y": 20, "radius": 10}}, format="json")
+        # What another worker process would load
+        with coverage_sessions.checkout(session_id, self.yard.id) as session:
+            self.assertEqual(int(session.window(slice(0, session.shape[0]), slice(0, session.shape[1]))[0].max()), 1)
+            with mock.patch('irrigation.layout.live_coverage.LOCK_WAIT', 0):
+                response = self.client.post(delta_url, {"add": {"x": 30, "y": 20, "radius": 10}}, format="json")
+        self.assertEqual(response.status_code, 409)
+
+    def test_delta_touches_only_its_tiles(self):
+        # 240 x 160 cells, so four tiles; the head's window lies in one
+        session_id = self.client.post(self.url, {"sprinklers": []}, format="json").data["session"]
+        delta_url = f'{self.url}{session_id}/'
+        head = {"x": 5, "y": 5, "radius": 3}
+        with mock.patch('irrigation.layout.live_coverage.cache.set_many', wraps=cache.set_many) as set_many:
+            response = self.client.post(delta_url, {"add": head}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(set_many.call_args.args[0]), 1)
+
+        moved = {**head, "x": 50}
+        self.assertEqual(self.client.post(delta_url, {"remove": moved}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(delta_url, {"remove": head, "add": moved}, format="json").status_code, 200)
+        response = self.client.post(delta_url, {"remove": moved}, format="json")
+        self.assertEqual(response.data["under_covered_area"], response.data["usable_area"])
+        self.assertEqual(self.client.post(delta_url, {"remove": moved}, format="json").status_code, 400)
+
+        cache.delete(f"coverage-session:{self.yard.id}:{session_id}:tile:0:0")
+        self.assertEqual(self.client.post(delta_url, {"add": head}, format="json").status_code, 404)
+
+class HydrozoneTest(YardTestCase):
+    def square(self, x0, y0, x1, y1):
+        return {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+    def test_shade_obstacles_and_slopes_split_zones(self):
+        types = ["full_sun", "full_shade", "obstacle", "slope"]
+        geoms = [shape(self.square(0, 0, 60, 40)), shape(self.square(40, 0, 80, 40)),
+                 shape(self.square(10, 10, 20, 20)), shape(self.square(0, 30, 30, 40))]
+        zones = build_hydrozones(types, geoms)
+
+        self.assertEqual([(z["exposure"], z["sloped"]) for z in zones],
+                         [("full_sun", False), ("full_sun", True), ("full_shade", False)])
+        self.assertEqual([z["geometry"].area for z in zones], [1200.0, 300.0, 1600.0])
+        # The zones tile the usable area
+        self.assertAlmostEqual(sum(z["geometry"].area for z in zones), build_usable_area(types, geoms).area)
+
+    def test_layout_heads_tagged_with_their_zone(self):
+        SketchElement.objects.create(yard=self.yard, type="full_sun", geometry=self.square(0, 0, 40, 30))
+        SketchElement.objects.create(yard=self.yard, type="partial_shade", geometry=self.square(40, 0, 80, 30))
+        response = self.client.post('/api/v1/projects/generate-layout/', {"yard_id": self.yard.id}, format='json')
+
+        zones = response.data["zones"]
+        self.assertEqual([(z["id"], z["exposure"]) for z in zones], [(1, "full_sun"), (2, "partial_shade")])
+        self.assertEqual(response.data["area_bounds"], (0.0, 0.0, 80.0, 30.0))
+        for zone in zones:
+            heads = [h for h in response.data["sprinklers"] if h["hydrozone"] == zone["id"]]
+            self.assertEqual(len(heads), zone["heads"])
+            minx, miny, maxx, maxy = zone["bounds"]
+            self.assertTrue(all(minx <= h["x"] <= maxx and miny <= h["y"] <= maxy for h in heads))
+        # Both zones get heads on the shared edge at x=40, each spraying into its own side
+        self.assertEqual({h["hydrozone"] for h in response.data["sprinklers"] if h["x"] == 40}, {1, 2})
+
+class BoundaryPlacementTest(TestCase):
+    def test_concave_corner_and_collinear_vertices(self):
+        from irrigation.layout.generator import layout_for_area
+        # L-shape with extra vertices along two edges, drawn clockwise
+        area = shapely.Polygon([(0, 0), (0, 60), (20, 60), (20, 20), (40, 20.2), (60, 20), (60, 0), (30, 0)])
+        corners = {(h["x"], h["y"]): h for h in layout_for_area(area) if h["angle"] not in (180, 360)}
+
+        self.assertEqual(set(corners), {(0, 0), (0, 60), (20, 60), (20, 20), (60, 20), (60, 0)})
+        self.assertEqual(corners[(20, 20)]["angle"], 270)  # concave: sprays round the inside corner
+        self.assertEqual(corners[(20, 20)]["direction"], 90)  # skips only the notch, 0-90°
+        self.assertEqual((corners[(0, 0)]["angle"], corners[(0, 0)]["direction"]), (90, 0))
+
+    def test_edges_spaced_within_target_and_deduped(self):
+        from irrigation.layout.boundary import HeadIndex, edge_heads, outline_rings
+        from irrigation.layout.generator import SPRINKLER_RADIUS, layout_for_area
+        index = HeadIndex(SPRINKLER_RADIUS)
+        heads = edge_heads(outline_rings(shapely.box(0, 0, 19, 19), SPRINKLER_RADIUS), SPRINKLER_RADIUS, index)
+        self.assertEqual(sorted((h["x"], h["y"]) for h in heads), [(0, 9.5), (9.5, 0), (9.5, 19), (19, 9.5)])
+
+        # Two parts touching at a corner share one head there
+        area = shapely.MultiPolygon([shapely.box(0, 0, 20, 20), shapely.box(20, 20, 40, 40)])
+        sprinklers = layout_for_area(area)
+        self.assertEqual(sum((h["x"], h["y"]) == (20, 20) for h in sprinklers), 1)
+        for i, a in enumerate(sprinklers):
+            for b in sprinklers[i + 1:]:
+                self.assertGreater(math.dist((a["x"], a["y"]), (b["x"], b["y"])), SPRINKLER_RADIUS / 4)
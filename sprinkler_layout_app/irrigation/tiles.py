@@ -0,0 +1,110 @@
+"""
+Level-of-detail tiles for yard sketches.
+
+Tiles form a quadtree over the square that encloses a yard's sketch: zoom 0
+is that whole square and each zoom level halves the tile size. Tile (x, y)
+counts from the lower-left corner, matching the sketch's y-up coordinates.
+"""
+import numpy as np
+import shapely
+from django.core.cache import cache
+from django.db.models import Max, Min
+from shapely.geometry import mapping
+
+from .layout_utils import geometries_with_fallback
+from .models import SketchElement
+
+MAX_TILE_ZOOM = 12
+TILE_RESOLUTION = 256  # nominal pixels across a tile; sets the simplify tolerance
+TILE_CACHE_TIMEOUT = 60 * 60  # seconds; keys include the yard revision
+
+
+def _load_elements(yard, bounds):
+    rows = list(
+        SketchElement.objects.filter(yard=yard)
+        .intersecting(bounds)
+        .order_by('id')
+        .values_list('id', 'type', 'geometry_wkb', 'properties')
+    )
+    geoms = geometries_with_fallback([row[0] for row in rows], [row[2] for row in rows])
+    return rows, np.where(shapely.is_missing(geoms), shapely.Point(), geoms)
+
+
+def tile_index(yard):
+    """Root square and zoom range for a yard's current revision."""
+    key = f"yard-tile-index:{yard.pk}:{yard.revision}"
+    index = cache.get(key)
+    if index is None:
+        extent = SketchElement.objects.filter(yard=yard).aggregate(
+            minx=Min('minx'), miny=Min('miny'), maxx=Max('maxx'), maxy=Max('maxy')
+        )
+        if extent['minx'] is not None:
+            minx, miny = extent['minx'], extent['miny']
+            size = max(extent['maxx'] - minx, extent['maxy'] - miny) or 1.0
+        else:
+            minx, miny, size = 0.0, 0.0, 1.0
+        index = {
+            "revision": yard.revision,
+            "origin": [float(minx), float(miny)],
+            "size": float(size),
+            "max_zoom": MAX_TILE_ZOOM,
+            "tile_resolution": TILE_RESOLUTION,
+        }
+        cache.set(key, index, TILE_CACHE_TIMEOUT)
+    return index
+
+
+def tile_bounds(index, z, x, y):
+    size = index["size"] / (2 ** z)
+    minx = index["origin"][0] + x * size
+    miny = index["origin"][1] + y * size
+    return minx, miny, minx + size, miny + size
+
+
+def build_tile(yard, z, x, y):
+    """
+    Returns a GeoJSON FeatureCollection of the yard's elements clipped to the
+    tile and simplified to the tile's resolution. Elements smaller than one
+    tile pixel are dropped. Results are cached per yard revision.
+    """
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError("Tile out of range")
+
+    key = f"yard-tile:{yard.pk}:{yard.revision}:{z}:{x}:{y}"
+    tile = cache.get(key)
+    if tile is not None:
+        return tile
+
+    index = tile_index(yard)
+    bounds = tile_bounds(index, z, x, y)
+    tolerance = (bounds[2] - bounds[0]) / TILE_RESOLUTION
+
+    rows, geoms = _load_elements(yard, bounds)
+    features = []
+    hits = np.flatnonzero(shapely.intersects(shapely.box(*bounds), geoms)) if len(geoms) else []
+    for i in hits:
+        geom = geoms[i]
+        if geom.geom_type != "Point":
+            minx, miny, maxx, maxy = geom.bounds
+            if max(maxx - minx, maxy - miny) < tolerance:
+                continue
+            geom = shapely.clip_by_rect(geom, *bounds).simplify(tolerance, preserve_topology=True)
+            if geom.is_empty:
+                continue
+        geom = shapely.set_precision(geom, tolerance / 4)
+        element_id, element_type, _, properties = rows[i]
+        features.append({
+            "type": "Feature",
+            "id": element_id,
+            "geometry": mapping(geom),
+            "properties": {"element_type": element_type, **(properties or {})},
+        })
+
+    tile = {
+        "type": "FeatureCollection",
+        "revision": yard.revision,
+        "tile": {"z": z, "x": x, "y": y, "bounds": list(bounds)},
+        "features": features,
+    }
+    cache.set(key, tile, TILE_CACHE_TIMEOUT)
+    return tile
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from .views import HelloView, LogoutView, RegisterView, PasswordResetRequestView, PasswordResetConfirmView, VerifyEmailView, CustomTokenObtainPairView, ProjectViewSet, YardViewSet, SprinklerHeadViewSet, ZoneViewSet, BillOfMaterialsViewSet, SketchElementViewSet
+from .views import HelloView, LogoutView, RegisterView, PasswordResetRequestView, PasswordResetConfirmView, VerifyEmailView, CustomTokenObtainPairView, ProjectViewSet, YardViewSet, SprinklerHeadViewSet, ZoneViewSet, BillOfMaterialsViewSet, SketchElementViewSet, ProfilingStatsView, yard_layout_async
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.routers import DefaultRouter
 
@@ -21,5 +21,7 @@ urlpatterns = [
     path('verify-email/', VerifyEmailView.as_view(), name='verify-email'),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('profiling/', ProfilingStatsView.as_view(), name='profiling'),
+    path('yards/<int:pk>/layout/async/', yard_layout_async, name='yard-layout-async'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.core.signing import TimestampSigner, BadSignature, SignatureExpired
+import hashlib
 import math
 
 signer = TimestampSigner()
@@ -23,4 +24,25 @@ def sanitize_layout_data(data):
             return [sanitize(item) for item in obj]
         return obj
 
-    return sanitize(data)
\ No newline at end of file
+    return sanitize(data)
+
+def location_point(location):
+    """(x, y) from a stored head or valve location, or None if it's missing or not finite numbers."""
+    if not isinstance(location, dict):
+        return None
+    try:
+        point = float(location['x']), float(location['y'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return point if all(map(math.isfinite, point)) else None
+
+def yard_etag(yard_id, revision, request):
+    """
+    Weak ETag for a yard resource at a revision. The variant covers the query
+    string and, for DRF requests, the negotiated format, since `Accept` alone
+    can pick e.g. PNG or SVG for the same URL.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    selector = f"{request.get_full_path()}|{renderer.format if renderer else ''}"
+    variant = hashlib.md5(selector.encode()).hexdigest()[:12]
+    return f'W/"yard-{yard_id}-r{revision}-{variant}"'
@@ -1,20 +1,30 @@
 # Django imports
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.core.mail import send_mail
+from django.db import transaction
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 
+from django.core.cache import cache
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+
 # DRF imports
 from rest_framework import status, permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.renderers import JSONRenderer
 
 # JWT imports
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.token_blacklist.models import (
     BlacklistedToken, OutstandingToken
@@ -22,7 +32,7 @@ from rest_framework_simplejwt.token_blacklist.models import (
 
 # App imports
 from .models import (
-    Project, Yard, SprinklerHead, Zone, BillOfMaterials, SketchElement
+    Project, Yard, SprinklerHead, Zone, BillOfMaterials, SketchElement, SketchRevision
 )
 from .serializers import (
     RegisterSerializer,
@@ -36,11 +46,28 @@ from .serializers import (
     BillOfMaterialsSerializer,
     SketchElementSerializer,
     FullProjectSetupSerializer,
+    ProjectSummarySerializer,
 )
-from .utils import generate_verification_token, verify_email_token, sanitize_layout_data
-from .layout_utils import parse_yard_geometry
-from shapely.geometry import Polygon
-from irrigation.layout.generator import generate_sprinkler_layout
+from .pagination import DashboardCursorPagination
+from .middleware import registry as profiling_registry, profile_store
+from .renderers import EventStreamRenderer, PNGRenderer, SVGRenderer
+from .outbox import enqueue_email
+from .auth import BlacklistFilteredRefreshToken, CachedJWTAuthentication
+from . import sketch_history
+from .utils import generate_verification_token, verify_email_token, yard_etag
+from concurrent.futures.process import BrokenProcessPool
+from irrigation.layout.pool import PoolSaturated, compute_layout, layout_pool
+
+# Geometry, numpy and matplotlib code is imported inside the views that use it,
+# so loading the URLconf (every management command's system checks, every
+# worker's startup) doesn't pay for shapely and matplotlib.
+
+RENDER_CACHE_TIMEOUT = 60 * 60 * 24  # seconds; entries are keyed on the layout hash
+
+def layout_payload(yard):
+    from .layout_utils import parse_yard_hydrozones
+    from irrigation.layout.pool import layout_payload_for_zones
+    return layout_payload_for_zones(parse_yard_hydrozones(yard))
 
 class HelloView(APIView):
     permission_classes = [IsAuthenticated]
@@ -48,20 +75,34 @@ class HelloView(APIView):
     def get(self, request):
         return Response(data={"message": f"Hello, {request.user.username}!"})
     
+class ProfilingStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        store = profile_store()
+        return Response({
+            "endpoints": profiling_registry.snapshot(),
+            "profiles": store.list() if store else [],
+        })
+
+    def delete(self, request):
+        profiling_registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = BlacklistFilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({"detail": "Logout successful"}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"error": "Invalid token or already blacklisted"}, status=status.HTTP_400_BAD_REQUEST)
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = BlacklistFilteredRefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -73,16 +114,18 @@ class RegisterView(APIView):
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            token = generate_verification_token(user)
-            verification_link = f"http://localhost:3000/verify-email/?token={token}"
-
-            send_mail(
-                subject="Verify Your Email",
-                message=f"Please verify your email by clicking the link: {verification_link}",
-                from_email="noreply@resirrigation.com",
-                recipient_list=[user.email],
-            )
+            # Queued with the user row; send_queued_email delivers it
+            with transaction.atomic():
+                user = serializer.save()
+                token = generate_verification_token(user)
+                verification_link = f"http://localhost:3000/verify-email/?token={token}"
+
+                enqueue_email(
+                    subject="Verify Your Email",
+                    message=f"Please verify your email by clicking the link: {verification_link}",
+                    from_email="noreply@resirrigation.com",
+                    recipient_list=[user.email],
+                )
 
             return Response({"message": "Registration successful. Check your email to verify your account."}, status=status.HTTP_201_CREATED)
 
@@ -124,8 +167,8 @@ class PasswordResetRequestView(APIView):
 
                 reset_link = f"http://yourfrontend.com/reset-password/{uidb64}/{token}/"
 
-                # Send email (in this example, just print to console)
-                send_mail(
+                # Queued; send_queued_email delivers it
+                enqueue_email(
                     subject="Password Reset Request",
                     message=f"Use this link to reset your password: {reset_link}",
                     from_email=None,
@@ -177,7 +220,59 @@ class IsOwner(permissions.BasePermission):
             return obj.zone.yard.project.user == request.user
         return False
     
-class ProjectViewSet(viewsets.ModelViewSet):
+def annotate_project_summary(projects):
+    """
+    Adds dashboard aggregates to a project queryset. Each total is a correlated
+    subquery, so the database only aggregates the rows on the requested page
+    and the cost per page stays flat as a user's project count grows.
+    """
+    def total(queryset, group_by, aggregate, output_field):
+        subquery = queryset.order_by().values(group_by).annotate(total=aggregate).values('total')[:1]
+        return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+    zones = Zone.objects.filter(yard__project=OuterRef('pk'))
+    heads = SprinklerHead.objects.filter(zone__yard__project=OuterRef('pk'))
+    sketch_saves = SketchRevision.objects.filter(yard__project=OuterRef('pk')).order_by('-created_at')
+    return projects.annotate(
+        yard_id=F('yard__id'),
+        zone_count=total(zones, 'yard__project', Count('id'), IntegerField()),
+        head_count=total(heads, 'zone__yard__project', Count('id'), IntegerField()),
+        total_gpm=total(heads, 'zone__yard__project', Sum('flow_rate'), FloatField()),
+        last_sketch_save=Subquery(sketch_saves.values('created_at')[:1]),
+    )
+
+class ListOptionsMixin:
+    """
+    Sparse fieldsets (?fields=id,location) on reads, plus exact-match id filters
+    declared as {query param: lookup} in `filter_params`. Each lookup should be
+    backed by an index that leads with the filtered column.
+    """
+    filter_params = {}
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields') if self.request else None
+        if not fields or self.request.method not in permissions.SAFE_METHODS:
+            return None
+        return [name.strip() for name in fields.split(',') if name.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        for param, lookup in self.filter_params.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            if not value.isdigit():
+                raise ValidationError({param: "Must be an integer id."})
+            queryset = queryset.filter(**{lookup: int(value)})
+        return queryset
+
+class ProjectViewSet(ListOptionsMixin, viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
 
@@ -187,6 +282,25 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'], url_path='dashboard')
+    def dashboard(self, request):
+        """Per-project yard, zone, head and flow totals, one cursor page at a time."""
+        queryset = annotate_project_summary(self.get_queryset())
+        paginator = DashboardCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(ProjectSummarySerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get', 'post'], url_path='bom')
+    def bill_of_materials(self, request, pk=None):
+        """Generated BOM for the project's yard; POST rebuilds it even if it is current."""
+        project = self.get_object()
+        yard = Yard.objects.filter(project=project).first()
+        if yard is None:
+            return Response({"error": "Project has no yard"}, status=status.HTTP_404_NOT_FOUND)
+        from .bom import regenerate_bom
+        bom = regenerate_bom(yard, force=request.method == 'POST')
+        return Response(BillOfMaterialsSerializer(bom).data)
+
     @action(detail=False, methods=['post'], url_path='full-setup')
     def create_full_project(self, request):
         serializer = FullProjectSetupSerializer(data=request.data, context={'request': request})
@@ -211,32 +325,69 @@ class ProjectViewSet(viewsets.ModelViewSet):
         except Yard.DoesNotExist:
             return Response({"error": "Yard not found"}, status=404)
 
-        usable_area = parse_yard_geometry(yard)
-
-        #print("USABLE AREA:", usable_area)  # for dev inspection
-
-        if usable_area.is_empty:
-            area_bounds = None
-            sprinklers = []
-        else:
-            area_bounds = usable_area.bounds
-            sprinklers = generate_sprinkler_layout(yard)
-
-        raw_response = {
-        "status": "sprinklers_generated",
-        "area_bounds": area_bounds,
-        "sprinklers": sprinklers,
-        "zones": []  # <- stub for future zoning logic
-        }
-
-        return Response(sanitize_layout_data(raw_response), status=200)
+        return Response(layout_payload(yard), status=200)
      
-class YardViewSet(viewsets.ModelViewSet):
+class YardViewSet(ListOptionsMixin, viewsets.ModelViewSet):
     serializer_class = YardSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    filter_params = {'project': 'project_id'}
 
     def get_queryset(self):
-        return Yard.objects.filter(project__user=self.request.user)
+        queryset = Yard.objects.filter(project__user=self.request.user)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        # Load the nested zones, heads and sketch in three queries per page
+        # rather than per yard, and only the ones the response includes
+        fields = self.requested_fields()
+        prefetch = []
+        if fields is None or 'zones' in fields:
+            prefetch.append(Prefetch('zones', queryset=Zone.objects.prefetch_related('sprinkler_heads')))
+        if fields is None or 'sketch_elements' in fields:
+            prefetch.append(Prefetch('sketch_elements', queryset=SketchElement.objects.defer('geometry_wkb')))
+        return queryset.prefetch_related(*prefetch)
+
+    def conditional(self, request, pk, respond):
+        """
+        Answers If-None-Match with 304 from a single revision lookup, before any
+        serializer or geometry work. Otherwise builds the response with `respond`
+        and tags it with the yard-revision ETag.
+        """
+        revision = self.get_queryset().filter(pk=pk).values_list('revision', flat=True).first()
+        if revision is None:
+            return respond()
+        etag = yard_etag(pk, revision, request)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_vary_headers(not_modified, ['Accept'])
+            return not_modified
+        response = respond()
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, kwargs['pk'], lambda: super(YardViewSet, self).retrieve(request, *args, **kwargs))
+
+    @action(detail=True, methods=['get'], url_path='layout')
+    def layout(self, request, pk=None):
+        """Generated sprinkler layout for the yard's current sketch."""
+        return self.conditional(request, pk, lambda: Response(layout_payload(self.get_object())))
+
+    @action(detail=True, methods=['get'], url_path='layout/stream', renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def layout_stream(self, request, pk=None):
+        """Generated layout as server-sent events, with heads sent in batches as each pass places them."""
+        from .layout_utils import parse_yard_hydrozones
+        from irrigation.layout.stream import aiter_events, layout_events
+        yard = self.get_object()
+        events = layout_events(lambda: parse_yard_hydrozones(yard))
+        if isinstance(request._request, ASGIRequest):
+            events = aiter_events(events)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+        return response
+
     def perform_create(self, serializer):
         project_id = self.request.data.get('project')
         try:
@@ -245,13 +396,230 @@ class YardViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Invalid project or you do not have permission to add to it.")
         
         serializer.save(project=project)
+
+    @action(detail=True, methods=['get'], url_path='render', renderer_classes=[PNGRenderer, SVGRenderer])
+    def render_image(self, request, pk=None):
+        """Generated layout as a PNG or SVG image (?format=png|svg)."""
+        return self.conditional(request, pk, lambda: self._render_image(request))
+
+    def _render_image(self, request):
+        from .layout_utils import build_hydrozones, build_usable_area, load_yard_elements, parse_yard_obstacles
+        from irrigation.layout.generator import LAYOUT_VERSION, layout_for_hydrozones
+        from irrigation.layout.render import render_layout
+        yard = self.get_object()
+        fmt = request.accepted_renderer.format
+        cache_key = f"layout-render:{fmt}:{LAYOUT_VERSION}:{yard.pk}:{yard.revision}"
+
+        image = cache.get(cache_key)
+        if image is None:
+            elements = load_yard_elements(yard)
+            usable_area = build_usable_area(*elements)
+            sprinklers = layout_for_hydrozones(build_hydrozones(*elements))
+            image = render_layout(usable_area, sprinklers, parse_yard_obstacles(yard), fmt=fmt)
+            cache.set(cache_key, image, RENDER_CACHE_TIMEOUT)
+        return Response(image)
+
+    @action(detail=True, methods=['post'], url_path='sketch/autosave')
+    def sketch_autosave(self, request, pk=None):
+        """Applies a batch of sketch deltas and records them as one revision."""
+        yard = self.get_object()
+        deltas = request.data.get('deltas')
+        if not isinstance(deltas, list) or not deltas:
+            return Response({"error": "deltas must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            sequence, created = sketch_history.record_autosave(yard, deltas, request.data.get('base_sequence'))
+        except sketch_history.SketchConflict as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except sketch_history.SketchHistoryError as e:
+            return Response({"error": e.args[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"sequence": sequence, "created": created})
+
+    @action(detail=True, methods=['post'], url_path='sketch/undo')
+    def sketch_undo(self, request, pk=None):
+        return self._move_sketch(sketch_history.undo)
+
+    @action(detail=True, methods=['post'], url_path='sketch/redo')
+    def sketch_redo(self, request, pk=None):
+        return self._move_sketch(sketch_history.redo)
+
+    @action(detail=True, methods=['post'], url_path='sketch/checkout')
+    def sketch_checkout(self, request, pk=None):
+        try:
+            sequence = int(request.data.get('sequence'))
+        except (TypeError, ValueError):
+            return Response({"error": "sequence is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._move_sketch(lambda yard: sketch_history.move_to(yard, sequence))
+
+    def _move_sketch(self, move):
+        try:
+            sequence = move(self.get_object())
+        except sketch_history.SketchConflict as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except sketch_history.SketchHistoryError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"sequence": sequence})
+
+    @action(detail=True, methods=['get'], url_path=r'sketch/revisions/(?P<sequence>\d+)')
+    def sketch_revision(self, request, pk=None, sequence=None):
+        """Sketch elements as they were at a given revision."""
+        try:
+            elements = sketch_history.reconstruct(self.get_object(), int(sequence))
+        except sketch_history.SketchHistoryError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"sequence": int(sequence), "elements": elements})
+
+    @action(detail=True, methods=['get'], url_path='tiles')
+    def tiles(self, request, pk=None):
+        """Root square, zoom range and revision of the yard's sketch tiles."""
+        from .tiles import tile_index
+        return self.conditional(request, pk, lambda: Response(tile_index(self.get_object())))
+
+    @action(detail=True, methods=['get'], url_path=r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)')
+    def tile(self, request, pk=None, z=None, x=None, y=None):
+        """Sketch elements clipped to one tile and simplified for its zoom level."""
+        return self.conditional(request, pk, lambda: self._tile(int(z), int(x), int(y)))
+
+    @action(detail=True, methods=['get'], url_path='water-budget')
+    def water_budget(self, request, pk=None):
+        """Per-zone precipitation rate and runtimes for a month (?month=1-12, default now)."""
+        month = request.query_params.get('month', str(timezone.now().month))
+        if not month.isdigit() or not 1 <= int(month) <= 12:
+            return Response({"error": "month must be 1-12"}, status=status.HTTP_400_BAD_REQUEST)
+        from .water_budget import yard_water_budget
+        return Response(yard_water_budget(self.get_object(), int(month)))
+
+    @action(detail=True, methods=['post'], url_path='coverage')
+    def coverage(self, request, pk=None):
+        """
+        Starts a live coverage session for manual head adjustment, over the
+        posted `sprinklers` or, without them, the generated layout.
+        """
+        from .layout_utils import build_hydrozones, build_usable_area, load_yard_elements
+        from irrigation.layout.generator import layout_for_hydrozones
+        from irrigation.layout.live_coverage import MAX_HEADS, CoverageSession, coverage_sessions, parse_head
+        yard = self.get_object()
+        elements = load_yard_elements(yard)
+        usable_area = build_usable_area(*elements)
+        if usable_area.is_empty:
+            return Response({"error": "Yard has no usable area"}, status=status.HTTP_400_BAD_REQUEST)
+        heads = request.data.get('sprinklers')
+        if heads is not None and not isinstance(heads, list):
+            return Response({"error": "sprinklers must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+        if heads is not None and len(heads) > MAX_HEADS:
+            return Response({"error": f"At most {MAX_HEADS} sprinklers per session"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            sprinklers = layout_for_hydrozones(build_hydrozones(*elements)) if heads is None else [parse_head(head) for head in heads]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = CoverageSession(yard.id, yard.revision, usable_area, sprinklers)
+        return Response({
+            "session": coverage_sessions.create(session),
+            "revision": yard.revision,
+            "cell_size": session.cell_size,
+            **session.totals(),
+            **session.regions(),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path=r'coverage/(?P<session_id>[\w-]+)')
+    def coverage_delta(self, request, pk=None, session_id=None):
+        """Applies one head change ({"remove": head, "add": head}; a move is both) to a coverage session."""
+        from irrigation.layout.live_coverage import SessionBusy, SessionExpired, coverage_sessions, parse_head
+        revision = self.get_queryset().filter(pk=pk).values_list('revision', flat=True).first()
+        if revision is None:
+            return Response({"error": "Yard not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            remove, add = (
+                parse_head(request.data[key]) if request.data.get(key) is not None else None
+                for key in ("remove", "add")
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if remove is None and add is None:
+            return Response({"error": "remove or add is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with coverage_sessions.checkout(session_id, pk) as session:
+                if session is None:
+                    return Response({"error": "Coverage session not found; start a new one"}, status=status.HTTP_404_NOT_FOUND)
+                if session.revision != revision:
+                    return Response({"error": "The yard changed; start a new coverage session"}, status=status.HTTP_409_CONFLICT)
+                changes, totals = session.apply(remove, add)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except SessionExpired:
+            return Response({"error": "Coverage session not found; start a new one"}, status=status.HTTP_404_NOT_FOUND)
+        except SessionBusy:
+            return Response({"error": "Coverage session is busy; retry"}, status=status.HTTP_409_CONFLICT,
+                            headers={'Retry-After': '1'})
+        return Response({"changes": changes, **totals})
+
+    def _tile(self, z, x, y):
+        from .tiles import build_tile
+        try:
+            tile = build_tile(self.get_object(), z, x, y)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return Response(tile)
     
-class ZoneViewSet(viewsets.ModelViewSet):
+@require_GET
+async def yard_layout_async(request, pk):
+    """
+    Async twin of YardViewSet.layout for ASGI deployments. The reads use the
+    async ORM and the layout itself runs in the layout process pool, so the
+    event loop keeps serving other requests meanwhile. Answers 429 with
+    Retry-After when the pool is saturated.
+    """
+    try:
+        authenticated = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({"error": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    if authenticated is None:
+        return JsonResponse({"error": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    revision = await Yard.objects.filter(pk=pk, project__user=authenticated[0]).values_list('revision', flat=True).afirst()
+    if revision is None:
+        return JsonResponse({"error": "Yard not found"}, status=status.HTTP_404_NOT_FOUND)
+    etag = yard_etag(pk, revision, request)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    # Raw rows go to the worker; WKB is copied to bytes since memoryviews don't pickle
+    elements = SketchElement.objects.filter(yard_id=pk).layout_inputs().order_by('id')
+    rows = {
+        element_id: (element_type, bytes(wkb) if wkb is not None else None, None)
+        async for element_id, element_type, wkb in elements.values_list('id', 'type', 'geometry_wkb')
+    }
+    missing = [element_id for element_id, (_, wkb, _) in rows.items() if wkb is None]
+    if missing:
+        async for element_id, geojson in SketchElement.objects.filter(id__in=missing).values_list('id', 'geometry'):
+            rows[element_id] = (rows[element_id][0], None, geojson)
+
+    try:
+        payload = await layout_pool.run(compute_layout, list(rows.values()))
+    except PoolSaturated:
+        response = JsonResponse({"error": "Layout workers are busy, try again shortly"}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = '1'
+        return response
+    except BrokenProcessPool:
+        response = JsonResponse({"error": "A layout worker failed, try again"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = '1'
+        return response
+    response = JsonResponse(payload)
+    response['ETag'] = etag
+    return response
+
+class ZoneViewSet(ListOptionsMixin, viewsets.ModelViewSet):
     serializer_class = ZoneSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    filter_params = {'yard': 'yard_id'}
 
     def get_queryset(self):
-        return Zone.objects.filter(yard__project__user=self.request.user)
+        queryset = Zone.objects.filter(yard__project__user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related('sprinkler_heads')
+        return queryset
     
     def perform_create(self, serializer):
         yard_id = self.request.data.get('yard')
@@ -261,10 +629,17 @@ class ZoneViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Invalid yard or you do not have permission to add to it.")
         
         serializer.save(yard=yard)
+
+    @action(detail=True, methods=['get'], url_path='hydraulics')
+    def hydraulics(self, request, pk=None):
+        """Lateral pipe network, pipe sizes and per-head pressure for the zone."""
+        from .hydraulics import zone_hydraulics
+        return Response(zone_hydraulics(self.get_object()))
     
-class SprinklerHeadViewSet(viewsets.ModelViewSet):
+class SprinklerHeadViewSet(ListOptionsMixin, viewsets.ModelViewSet):
     serializer_class = SprinklerHeadSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    filter_params = {'zone': 'zone_id', 'yard': 'zone__yard_id'}
 
     def get_queryset(self):
         return SprinklerHead.objects.filter(zone__yard__project__user=self.request.user)
@@ -278,9 +653,10 @@ class SprinklerHeadViewSet(viewsets.ModelViewSet):
         
         serializer.save(zone=zone)
     
-class BillOfMaterialsViewSet(viewsets.ModelViewSet):
+class BillOfMaterialsViewSet(ListOptionsMixin, viewsets.ModelViewSet):
     serializer_class = BillOfMaterialsSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    filter_params = {'project': 'project_id'}
 
     def get_queryset(self):
         return BillOfMaterials.objects.filter(project__user=self.request.user)
@@ -294,12 +670,14 @@ class BillOfMaterialsViewSet(viewsets.ModelViewSet):
         
         serializer.save(project=project)
    
-class SketchElementViewSet(viewsets.ModelViewSet):
+class SketchElementViewSet(ListOptionsMixin, viewsets.ModelViewSet):
     serializer_class = SketchElementSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    filter_params = {'yard': 'yard_id'}
 
     def get_queryset(self):
-        return SketchElement.objects.filter(yard__project__user=self.request.user)
+        # API responses only need the GeoJSON; skip the binary layout copy
+        return SketchElement.objects.filter(yard__project__user=self.request.user).defer('geometry_wkb')
     
     def perform_create(self, serializer):
         yard_id = self.request.data.get('yard')
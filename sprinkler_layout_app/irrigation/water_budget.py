@@ -0,0 +1,208 @@
+"""
+Water budget engine: precipitation rates and runtimes per zone.
+
+Precipitation rate uses the area method, PR = 96.25 * GPM / area, where each
+head waters its share of a square spaced at the distance to its nearest
+neighbour in the zone (head-to-head spacing). Water need is the reference ET
+for the yard's zip prefix and month times the turf's crop coefficient; the
+soil decides how long the turf can go between waterings and how many
+cycles a runtime must be split into to avoid runoff.
+
+The soil, turf and ET tables in irrigation/data are parsed once per process,
+on first use, into dicts keyed by normalized name, so budgeting a zone is a
+few dict lookups and small array operations.
+"""
+import csv
+import math
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .models import SprinklerHead
+from .utils import location_point
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+
+PR_CONSTANT = 96.25  # converts GPM per square foot into inches per hour
+APPLICATION_EFFICIENCY = 0.7
+ALLOWED_DEPLETION = 0.5  # share of the root zone's available water used between waterings
+MAX_INTERVAL_DAYS = 7
+DEFAULT_SOIL = 'loam'
+DEFAULT_TURF = (0.8, 6.0)  # kc, root depth in inches
+
+Soil = namedtuple('Soil', 'intake_rate available_water')  # in/hr, in/ft
+Turf = namedtuple('Turf', 'kc root_depth')  # -, inches
+Tables = namedtuple('Tables', 'soils turf et0 et0_default')
+Site = namedtuple('Site', 'soil turf et0 assumed')
+
+
+def table_key(name):
+    """'Tall Fescue' and 'tall-fescue' both become 'tall_fescue'."""
+    return '_'.join(str(name or '').lower().replace('-', ' ').split())
+
+
+def _read(name):
+    with open(DATA_DIR / name, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+@lru_cache(maxsize=None)
+def load_tables():
+    soils = {
+        row['soil_type']: Soil(float(row['intake_rate_in_hr']), float(row['available_water_in_ft']))
+        for row in _read('soil_infiltration.csv')
+    }
+    turf = {
+        row['grass_type']: Turf(float(row['kc']), float(row['root_depth_in']))
+        for row in _read('crop_coefficients.csv')
+    }
+    et0 = {
+        row['zip_prefix']: np.array([float(row[month]) for month in MONTHS])
+        for row in _read('et_reference.csv')
+    }
+    regions = [values for prefix, values in et0.items() if len(prefix) == 1]
+    return Tables(soils, turf, et0, np.mean(regions, axis=0))
+
+
+@lru_cache(maxsize=4096)
+def site_factors(soil_type, grass_type, zip_code):
+    """
+    Soil, turf and monthly reference ET (in/day) for a yard. ET is looked up by
+    3-digit zip prefix, then by the 1-digit region. Inputs missing from the
+    tables fall back to defaults and are listed in `assumed`.
+    """
+    tables = load_tables()
+    assumed = []
+
+    soil = tables.soils.get(table_key(soil_type))
+    if soil is None:
+        soil = tables.soils[DEFAULT_SOIL]
+        assumed.append('soil_type')
+
+    turf = tables.turf.get(table_key(grass_type))
+    if turf is None:
+        turf = Turf(*DEFAULT_TURF)
+        assumed.append('grass_type')
+
+    digits = ''.join(c for c in str(zip_code or '') if c.isdigit())
+    et0 = tables.et0.get(digits[:3]) if len(digits) >= 3 else None
+    if et0 is None:
+        et0 = tables.et0.get(digits[:1])
+    if et0 is None:
+        et0 = tables.et0_default
+        assumed.append('zip_code')
+
+    return Site(soil, turf, et0, tuple(assumed))
+
+
+def precipitation_rate(flow_rate, angle, throw_radius, xy=None):
+    """
+    Zone precipitation rate in inches per hour from per-head arrays. A head's
+    spacing is the distance to its nearest located neighbour, or its throw
+    radius when it has no location or is alone in the zone. `xy` rows are
+    NaN for heads without a location.
+    """
+    flow = np.asarray(flow_rate, dtype=float)
+    arc = np.clip(np.asarray(angle, dtype=float), 1.0, 360.0) / 360.0
+    spacing = np.array(throw_radius, dtype=float)
+
+    if xy is not None and len(flow) > 1:
+        xy = np.asarray(xy, dtype=float)
+        located = ~np.isnan(xy).any(axis=1)
+        if located.sum() > 1:
+            points = xy[located]
+            distances = np.linalg.norm(points[:, np.newaxis, :] - points[np.newaxis, :, :], axis=-1)
+            np.fill_diagonal(distances, np.inf)
+            nearest = distances.min(axis=1)
+            spacing[located] = np.where(nearest > 0, nearest, spacing[located])
+
+    area = float((spacing * spacing * arc).sum())
+    if area <= 0:
+        return None
+    return PR_CONSTANT * float(flow.sum()) / area
+
+
+def allowable_depletion(site):
+    """Inches the root zone can lose before the turf needs water again."""
+    return site.soil.available_water * site.turf.root_depth / 12 * ALLOWED_DEPLETION
+
+
+def zone_budget(site, month, pr):
+    """Watering interval, runtime and cycle-soak split for one zone."""
+    et0 = float(site.et0[month - 1])
+    crop_et = et0 * site.turf.kc  # in/day
+    budget = {'precipitation_rate': None, 'et0': et0, 'crop_et': round(crop_et, 3)}
+    if pr is None or crop_et <= 0:
+        return budget
+
+    interval = int(min(MAX_INTERVAL_DAYS, max(1, allowable_depletion(site) // crop_et)))
+    depth = crop_et * interval / APPLICATION_EFFICIENCY
+    runtime = depth / pr * 60
+    cycles = max(1, math.ceil(pr / site.soil.intake_rate))
+    budget.update({
+        'precipitation_rate': round(pr, 3),
+        'interval_days': interval,
+        'depth_inches': round(depth, 3),
+        'runtime_minutes': round(runtime, 1),
+        'cycles': cycles,
+        'cycle_minutes': round(runtime / cycles, 1),
+        'weekly_inches': round(depth * 7 / interval, 2),
+    })
+    return budget
+
+
+def _location(location):
+    """A head's (x, y), or NaNs (unplaced) if its location is missing or unreadable."""
+    return location_point(location) or (math.nan, math.nan)
+
+
+def zone_inputs(zones):
+    """
+    Yields (zone id, yard zip code, Site, precipitation rate) for a Zone
+    queryset using two queries, however many zones it covers.
+    """
+    heads = defaultdict(list)
+    rows = (
+        SprinklerHead.objects.filter(zone__in=zones.values('id'))
+        .values_list('zone_id', 'flow_rate', 'angle', 'throw_radius', 'location')
+    )
+    for zone_id, flow, angle, radius, location in rows.iterator():
+        heads[zone_id].append((flow, angle, radius, *_location(location)))
+
+    for zone_id, soil_type, grass_type, zip_code in zones.values_list(
+        'id', 'yard__soil_type', 'yard__grass_type', 'yard__zip_code'
+    ).iterator():
+        site = site_factors(soil_type, grass_type, zip_code)
+        zone_heads = np.array(heads.pop(zone_id, ()), dtype=float).reshape(-1, 5)
+        pr = precipitation_rate(zone_heads[:, 0], zone_heads[:, 1], zone_heads[:, 2], zone_heads[:, 3:]) if len(zone_heads) else None
+        yield zone_id, zip_code, site, pr
+
+
+def zone_budgets(zones, month):
+    """Budgets for a Zone queryset: {zone id: budget}."""
+    return {zone_id: zone_budget(site, month, pr) for zone_id, _, site, pr in zone_inputs(zones)}
+
+
+def yard_water_budget(yard, month):
+    site = site_factors(yard.soil_type, yard.grass_type, yard.zip_code)
+    zones = yard.zones.order_by('zone_number')
+    budgets = zone_budgets(zones, month)
+    return {
+        'yard': yard.id,
+        'month': month,
+        'site': {
+            'intake_rate': site.soil.intake_rate,
+            'available_water': site.soil.available_water,
+            'kc': site.turf.kc,
+            'root_depth': site.turf.root_depth,
+            'et0': float(site.et0[month - 1]),
+            'assumed': list(site.assumed),
+        },
+        'zones': [
+            {'zone': zone_id, 'zone_number': number, **budgets[zone_id]}
+            for zone_id, number in zones.values_list('id', 'zone_number')
+        ],
+    }
@@ -0,0 +1,66 @@
+"""
+Weather data for scheduling.
+
+A weather source answers `week(zip_code, start)` with two 7-day arrays:
+reference ET (in/day) and rainfall (inches). The class is chosen by the
+IRRIGATION_WEATHER['SOURCE'] setting, so a forecast API client can replace
+the file-based stand-in without touching the scheduler.
+"""
+import abc
+import csv
+import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .water_budget import site_factors
+
+
+class WeatherSource(abc.ABC):
+    @abc.abstractmethod
+    def week(self, zip_code, start):
+        """(reference ET in/day, rainfall in) as two 7-day arrays from `start`."""
+
+
+class ClimatologyWeatherSource(WeatherSource):
+    """Monthly average ET from the water budget tables and no rain."""
+
+    def week(self, zip_code, start):
+        et0 = site_factors(None, None, zip_code).et0
+        days = [start + datetime.timedelta(days=i) for i in range(7)]
+        return np.array([et0[day.month - 1] for day in days]), np.zeros(7)
+
+
+class FileWeatherSource(ClimatologyWeatherSource):
+    """
+    Reads daily observations or forecasts from a CSV with columns
+    zip_prefix, date, et0_in, rain_in. Prefixes may be one or three digits;
+    days the file doesn't cover fall back to climatology.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or settings.IRRIGATION_WEATHER['FILE'])
+        self.days = {}
+        if self.path.exists():
+            with open(self.path, newline='') as f:
+                for row in csv.DictReader(f):
+                    day = datetime.date.fromisoformat(row['date'])
+                    self.days[(row['zip_prefix'], day)] = (float(row['et0_in']), float(row['rain_in'] or 0))
+
+    def week(self, zip_code, start):
+        et0, rain = super().week(zip_code, start)
+        digits = ''.join(c for c in str(zip_code or '') if c.isdigit())
+        for i in range(7):
+            day = start + datetime.timedelta(days=i)
+            found = self.days.get((digits[:3], day)) or self.days.get((digits[:1], day))
+            if found:
+                et0[i], rain[i] = found
+        return et0, rain
+
+
+@lru_cache(maxsize=None)
+def weather_source():
+    return import_string(settings.IRRIGATION_WEATHER['SOURCE'])()
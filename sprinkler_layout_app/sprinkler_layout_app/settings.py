@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'irrigation.middleware.QueryProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'sprinkler_layout_app.urls'
@@ -78,14 +79,32 @@ WSGI_APPLICATION = 'sprinkler_layout_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections persist for DB_CONN_MAX_AGE seconds and are health-checked
+# before reuse. With DB_POOL (PostgreSQL on psycopg 3 with psycopg[pool]), each
+# process instead keeps a pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections; Django requires CONN_MAX_AGE = 0 then, and pooling is the better
+# fit under ASGI, where persistent connections are tied to request threads.
+# DB_ENGINE=django.db.backends.sqlite3 with DB_NAME as a file path runs locally.
+DB_ENGINE = config('DB_ENGINE', default='django.db.backends.postgresql')
+DB_POOL = config('DB_POOL', default=False, cast=bool) and DB_ENGINE.endswith('postgresql')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': DB_ENGINE,
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10.0, cast=float),  # seconds to wait for a free connection
+            },
+        } if DB_POOL else {},
     }
 }
 
@@ -136,14 +155,55 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',  # require login by default
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # if you use JWT
+        'irrigation.auth.CachedJWTAuthentication',  # JWT with a short-lived per-process user cache
         'rest_framework.authentication.SessionAuthentication',        # optional, for browsable API login
     ],
+    'DEFAULT_PAGINATION_CLASS': 'irrigation.pagination.DefaultCursorPagination',
 }
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' # actual SMTP backend for production
 EMAIL_HOST_USER = 'reset@resi-irrigation.com'  # Optional, for from address
 
+# Request profiling (latency histograms, query counts, duplicate queries).
+# Aggregates are served to staff at /api/v1/profiling/.
+IRRIGATION_PROFILING = {
+    'ENABLED': config('PROFILING_ENABLED', default=False, cast=bool),
+    'PROFILE_SAMPLE_RATE': config('PROFILING_SAMPLE_RATE', default=0.0, cast=float),  # fraction of requests run under cProfile
+    'PROFILE_THRESHOLD_MS': config('PROFILING_THRESHOLD_MS', default=500, cast=float),  # only keep dumps slower than this
+    'PROFILE_DIR': config('PROFILING_DIR', default=str(BASE_DIR / 'profiles')),
+    'PROFILE_MAX_FILES': config('PROFILING_MAX_FILES', default=50, cast=int),
+}
+
+# Weather data for `manage.py compute_schedules`. SOURCE is any class with a
+# week(zip_code, start) method; the default reads daily rows from FILE.
+IRRIGATION_WEATHER = {
+    'SOURCE': config('WEATHER_SOURCE', default='irrigation.weather.FileWeatherSource'),
+    'FILE': config('WEATHER_FILE', default=str(BASE_DIR / 'weather.csv')),
+}
+
+SIMPLE_JWT = {
+    'TOKEN_REFRESH_SERIALIZER': 'irrigation.serializers.CachedTokenRefreshSerializer',
+}
+
+# JWT user cache and blacklist prefilter (see irrigation/auth.py)
+IRRIGATION_AUTH = {
+    'USER_CACHE_TTL': config('AUTH_USER_CACHE_TTL', default=30.0, cast=float),  # seconds
+    'USER_CACHE_SIZE': 10000,
+    'BLACKLIST_SYNC_SECONDS': config('AUTH_BLACKLIST_SYNC_SECONDS', default=5.0, cast=float),
+    'BLACKLIST_CAPACITY': 100000,
+    'BLACKLIST_GAP_SECONDS': 60.0,  # must outlast the longest transaction that blacklists a token
+}
+
+# Worker processes for the async layout endpoint (see irrigation/layout/pool.py);
+# past MAX_PENDING running plus queued jobs it answers 429
+IRRIGATION_LAYOUT_POOL = {
+    'WORKERS': config('LAYOUT_WORKERS', default=2, cast=int),
+    'MAX_PENDING': config('LAYOUT_MAX_PENDING', default=8, cast=int),
+}
+
+# Unit prices for bill-of-materials cost estimates; without the file BOMs are unpriced
+IRRIGATION_BOM_PRICES = config('BOM_PRICES_FILE', default=str(BASE_DIR / 'irrigation' / 'data' / 'prices.csv'))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
\ No newline at end of file